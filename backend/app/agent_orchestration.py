@@ -1,28 +1,34 @@
+import asyncio
 import uuid
 from datetime import datetime
-from typing import Dict, Any, Tuple
+from typing import Any, AsyncIterator, Dict, List, Tuple
 
-from .schemas import ChatSessionState, ChatTurn, ChatResponse, PatientReport, RAGQueryResponse, Citation
-from .patient_utils import lookup_patient_by_name
-from .rag_retriever import RAGRetriever
+from .config import settings
+from .schemas import ChatSessionState, ChatTurn, ChatResponse, PatientReport, RAGQueryResponse, Citation, WebSearchResult
+from .patient_utils import lookup_patient_by_name, search_patients_by_name
+from .rag_retriever import aretrieve
 from .web_search import web_search
-from .logging_utils import log_agent_event
+from .logging_utils import log_agent_event, log_error
+from .metrics import timed
+from .session_store import build_session_store
+from .executors import run_http, run_io
 
 
-SESSIONS: Dict[str, ChatSessionState] = {}
-retriever = RAGRetriever()
+sessions = build_session_store()
 
 
 def get_or_create_session(session_id: str | None) -> ChatSessionState:
-    if session_id and session_id in SESSIONS:
-        return SESSIONS[session_id]
+    if session_id:
+        state = sessions.get(session_id)
+        if state is not None:
+            return state
     sid = session_id or str(uuid.uuid4())
     state = ChatSessionState(session_id=sid, history=[])
-    SESSIONS[sid] = state
+    sessions.save(state)
     return state
 
 
-def receptionist_handle(state: ChatSessionState, message: str, patient_name: str | None) -> Tuple[str, str | None]:
+async def receptionist_handle(state: ChatSessionState, message: str, patient_name: str | None) -> Tuple[str, str | None]:
     # Greeting and patient identification
     if state.patient_report is None:
         # Try to identify patient
@@ -31,8 +37,14 @@ def receptionist_handle(state: ChatSessionState, message: str, patient_name: str
                 "Hello! I'm your post-discharge assistant. May I have your full name to pull your report?",
                 None,
             )
-        matches = lookup_patient_by_name(patient_name)
+        matches = await run_io(lookup_patient_by_name, patient_name)
         if not matches:
+            candidates = await run_io(search_patients_by_name, patient_name, limit=5)
+            if candidates:
+                suggestions = list(dict.fromkeys(m.patient_name for m, _ in candidates))[:3]
+                names = ", ".join(suggestions)
+                log_agent_event({"type": "patient_lookup", "result": "fuzzy", "query": patient_name, "candidates": names})
+                return (f"I couldn't find an exact match for '{patient_name}'. Did you mean: {names}? Please confirm your full name.", None)
             log_agent_event({"type": "patient_lookup", "result": "not_found", "query": patient_name})
             return (f"I couldn't find a patient matching '{patient_name}'. Could you recheck the spelling?", None)
         if len(matches) > 1:
@@ -59,36 +71,78 @@ def receptionist_handle(state: ChatSessionState, message: str, patient_name: str
     )
 
 
-def clinical_handle(state: ChatSessionState, message: str) -> Tuple[str, RAGQueryResponse | None]:
-    # RAG over nephrology reference, fallback to web
-    retrieved = retriever.retrieve(message)
+def _retrieval_is_good(retrieved: List[Dict[str, Any]]) -> bool:
+    if not retrieved:
+        return False
+    if settings.rag_max_distance is None:
+        return True
+    # Hybrid lists can be topped by a lexical-only hit (distance None); gate on the
+    # closest dense match present, and treat a list without any as not good enough
+    distances = [r["distance"] for r in retrieved if r.get("distance") is not None]
+    return bool(distances) and min(distances) <= settings.rag_max_distance
+
+
+async def _await_until(task: "asyncio.Task", deadline: float, stage: str, default: Any) -> Any:
+    # Wait for `task` until the turn deadline; on timeout it is cancelled and `default` used
+    remaining = max(0.0, deadline - asyncio.get_running_loop().time())
+    try:
+        return await asyncio.wait_for(task, timeout=remaining)
+    except asyncio.TimeoutError:
+        log_agent_event({"type": "clinical_timeout", "stage": stage})
+    except Exception as e:
+        log_error(f"clinical {stage} failed", {"error": str(e)})
+    return default
+
+
+async def _gather_sources(message: str) -> Tuple[List[Dict[str, Any]], List[WebSearchResult]]:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.clinical_turn_deadline_ms / 1000.0
+    rag_task = asyncio.create_task(aretrieve(message))
+    web_task = None
+    if settings.clinical_web_search_mode == "parallel":
+        web_task = asyncio.create_task(run_http(web_search, message))
+    retrieved = await _await_until(rag_task, deadline, "rag", [])
+    if _retrieval_is_good(retrieved):
+        if web_task is not None:
+            web_task.cancel()
+        return retrieved, []
+    # Reference came back empty (or too distant): web search gets whatever budget is left
+    if web_task is None:
+        web_task = asyncio.create_task(run_http(web_search, message))
+    web = await _await_until(web_task, deadline, "web_search", [])
+    return retrieved, web
+
+
+def _reference_answer(retrieved: List[Dict[str, Any]]) -> Tuple[str, RAGQueryResponse]:
     citations = []
     for r in retrieved:
         meta = r.get("metadata", {})
         citations.append(Citation(page=meta.get("page"), section=meta.get("section"), score=r.get("distance")))
-    if retrieved:
-        context_snippets = "\n\n".join([r.get("text", "") for r in retrieved[:3]])
-        # Build inline citation strings
-        citation_strs = []
-        for c in citations[:3]:
-            parts = []
-            if c.section:
-                parts.append(str(c.section))
-            if c.page:
-                parts.append(f"p. {c.page}")
-            citation_strs.append("; ".join(parts) if parts else "reference")
-        inline_cites = ", ".join([f"[{s}]" for s in citation_strs]) if citation_strs else ""
+    context_snippets = "\n\n".join([r.get("text", "") for r in retrieved[:3]])
+    # Build inline citation strings
+    citation_strs = []
+    for c in citations[:3]:
+        parts = []
+        if c.section:
+            parts.append(str(c.section))
+        if c.page:
+            parts.append(f"p. {c.page}")
+        citation_strs.append("; ".join(parts) if parts else "reference")
+    inline_cites = ", ".join([f"[{s}]" for s in citation_strs]) if citation_strs else ""
+
+    answer = (
+        f"Based on nephrology reference {inline_cites}:\n{context_snippets}\n\n"
+        "Let me know if you want more detail or guidance tailored to your meds and labs."
+    )
+    rag = RAGQueryResponse(answer=answer, citations=citations, retrieved_chunks=retrieved)
+    log_agent_event({"type": "rag_query", "results": len(retrieved)})
+    return (answer, rag)
 
-        answer = (
-            f"Based on nephrology reference {inline_cites}:\n{context_snippets}\n\n"
-            "Let me know if you want more detail or guidance tailored to your meds and labs."
-        )
-        rag = RAGQueryResponse(answer=answer, citations=citations, retrieved_chunks=retrieved)
-        log_agent_event({"type": "rag_query", "results": len(retrieved)})
-        return (answer, rag)
 
-    # Fallback web search
-    web = web_search(message)
+def _clinical_answer(retrieved: List[Dict[str, Any]], web: List[WebSearchResult]) -> Tuple[str, RAGQueryResponse | None]:
+    if _retrieval_is_good(retrieved):
+        return _reference_answer(retrieved)
+
     if web:
         top = web[0]
         answer = (
@@ -96,27 +150,66 @@ def clinical_handle(state: ChatSessionState, message: str) -> Tuple[str, RAGQuer
         )
         log_agent_event({"type": "web_search", "results": len(web)})
         return (answer, None)
+    if retrieved:
+        # Weak reference matches still beat no answer at all
+        return _reference_answer(retrieved)
     return ("I'm sorry, I couldn't find relevant information. Please consult your provider.", None)
 
 
-def handle_chat(session_id: str | None, message: str, patient_name: str | None) -> ChatResponse:
-    state = get_or_create_session(session_id)
+async def clinical_handle(state: ChatSessionState, message: str) -> Tuple[str, RAGQueryResponse | None]:
+    # RAG over nephrology reference, web search as fallback, both within the turn deadline
+    retrieved, web = await _gather_sources(message)
+    return _clinical_answer(retrieved, web)
+
+
+def _answer_segments(answer: str) -> List[str]:
+    # Paragraph-sized deltas; concatenated they reproduce the answer exactly
+    parts = answer.split("\n\n")
+    return [p + "\n\n" for p in parts[:-1]] + [parts[-1]]
+
+
+async def stream_chat(session_id: str | None, message: str, patient_name: str | None) -> AsyncIterator[Tuple[str, Any]]:
+    # Yields (event, payload) as each step finishes: session, receptionist,
+    # handoff, citations, answer deltas and finally the full ChatResponse as "done"
+    with timed("session_load"):
+        state = await run_io(get_or_create_session, session_id)
+    yield "session", {"session_id": state.session_id}
     state.history.append(ChatTurn(role="user", content=message, timestamp=datetime.utcnow()))
 
-    receptionist_msg, handoff = receptionist_handle(state, message, patient_name)
+    with timed("receptionist"):
+        receptionist_msg, handoff = await receptionist_handle(state, message, patient_name)
+    yield "receptionist", {"agent": "receptionist", "message": receptionist_msg}
     if handoff == "clinical":
-        clinical_answer, rag = clinical_handle(state, message)
-        state.history.append(ChatTurn(role="assistant", content=clinical_answer, timestamp=datetime.utcnow()))
         log_agent_event({"type": "handoff", "from": "receptionist", "to": "clinical", "reason": "medical_query"})
-        return ChatResponse(
+        yield "handoff", {"from": "receptionist", "to": "clinical", "reason": "medical_query"}
+        with timed("clinical"):
+            retrieved, web = await _gather_sources(message)
+            clinical_answer, rag = _clinical_answer(retrieved, web)
+        citations = rag.citations if rag else []
+        yield "citations", {"citations": [c.model_dump() for c in citations]}
+        for segment in _answer_segments(clinical_answer):
+            yield "answer", {"agent": "clinical", "delta": segment}
+        state.history.append(ChatTurn(role="assistant", content=clinical_answer, timestamp=datetime.utcnow()))
+        with timed("session_save"):
+            await run_io(sessions.save, state)
+        yield "done", ChatResponse(
             session_id=state.session_id,
             response=clinical_answer,
             agent="clinical",
             handoff="receptionist->clinical",
-            citations=rag.citations if rag else [],
+            citations=citations,
         )
+        return
 
     state.history.append(ChatTurn(role="assistant", content=receptionist_msg, timestamp=datetime.utcnow()))
-    return ChatResponse(session_id=state.session_id, response=receptionist_msg, agent="receptionist", handoff=None, citations=[])
+    with timed("session_save"):
+        await run_io(sessions.save, state)
+    yield "done", ChatResponse(session_id=state.session_id, response=receptionist_msg, agent="receptionist", handoff=None, citations=[])
 
 
+async def handle_chat(session_id: str | None, message: str, patient_name: str | None) -> ChatResponse:
+    response: ChatResponse | None = None
+    async for event, payload in stream_chat(session_id, message, patient_name):
+        if event == "done":
+            response = payload
+    return response
@@ -0,0 +1,144 @@
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from .chunk_io import iter_chunks
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have how i in is it my of on or should the this to was what "
+    "when which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    # Okapi BM25 over an inverted index. Each term's postings hold the document
+    # rows and their precomputed tf saturation/length normalisation, so a query
+    # only sums idf-weighted arrays for its terms.
+    def __init__(self, chunks: List[Dict[str, Any]], k1: float = 1.5, b: float = 0.75) -> None:
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        raw: Dict[str, Tuple[List[int], List[int]]] = {}
+        lengths: List[int] = []
+        for i, ch in enumerate(chunks):
+            text = ch.get("text", "")
+            self.ids.append(str(ch.get("id", i)))
+            self.texts.append(text)
+            self.metadatas.append({k: v for k, v in ch.items() if k != "text"})
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                docs, tfs = raw.setdefault(term, ([], []))
+                docs.append(i)
+                tfs.append(tf)
+
+        n = len(lengths)
+        dl = np.asarray(lengths, dtype=np.float32)
+        avgdl = float(dl.mean()) if n else 0.0
+        norm = k1 * (1 - b + b * dl / avgdl) if avgdl else np.full(n, k1, dtype=np.float32)
+        self.size = n
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for term, (docs, tfs) in raw.items():
+            rows = np.asarray(docs, dtype=np.int32)
+            tf = np.asarray(tfs, dtype=np.float32)
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            self.postings[term] = (rows, (idf * tf * (k1 + 1) / (tf + norm[rows])).astype(np.float32))
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        terms = [t for t in dict.fromkeys(tokenize(query)) if t in self.postings]
+        if not terms or k <= 0:
+            return []
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in terms:
+            rows, weights = self.postings[term]
+            scores[rows] += weights
+        hit = np.flatnonzero(scores)
+        if len(hit) > k:
+            hit = hit[np.argpartition(-scores[hit], k - 1)[:k]]
+        hit = hit[np.argsort(-scores[hit], kind="stable")]
+        return [(int(i), float(scores[i])) for i in hit]
+
+    def covers(self, query: str, row: int) -> bool:
+        # Every query term occurs in the document (postings rows are ascending)
+        for term in dict.fromkeys(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is None:
+                return False
+            rows = posting[0]
+            pos = int(np.searchsorted(rows, row))
+            if pos >= len(rows) or rows[pos] != row:
+                return False
+        return True
+
+    def is_decisive(self, query: str, hits: List[Tuple[int, float]], ratio: float, min_score: float) -> bool:
+        # The top hit matches every query term and is far enough ahead of the
+        # runner-up that dense retrieval is not worth an embedding call
+        if ratio <= 0 or not hits or hits[0][1] < min_score:
+            return False
+        if len(hits) > 1 and hits[0][1] < ratio * hits[1][1]:
+            return False
+        return self.covers(query, hits[0][0])
+
+    def result(self, row: int, score: float) -> Dict[str, Any]:
+        return {"id": self.ids[row], "text": self.texts[row], "metadata": self.metadatas[row], "distance": None, "bm25": score}
+
+
+class LexicalIndex:
+    # BM25 over the chunks file, rebuilt only when the file's mtime/size changes.
+    def __init__(self, path: str, k1: float, b: float) -> None:
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._signature: Tuple[int, int] | None = None
+        self._index = BM25Index([], k1, b)
+
+    def _stat_signature(self) -> Tuple[int, int] | None:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def index(self) -> BM25Index:
+        sig = self._stat_signature()
+        if sig is not None and sig == self._signature:
+            return self._index
+        with self._lock:
+            sig = self._stat_signature()
+            if sig != self._signature:
+                chunks = list(iter_chunks(self.path)) if sig is not None else []
+                self._index = BM25Index(chunks, self.k1, self.b)
+                self._signature = sig
+            return self._index
+
+    def signature(self) -> Tuple[int, int] | None:
+        self.index()
+        return self._signature
+
+
+def reciprocal_rank_fusion(rankings: List[List[Dict[str, Any]]], k: int, rrf_k: int = 60) -> List[Dict[str, Any]]:
+    # Items are matched by id; the first ranking's copy wins so dense distances survive
+    fused: Dict[str, Dict[str, Any]] = {}
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            cid = item["id"]
+            scores[cid] = scores.get(cid, 0.0) + 1.0 / (rrf_k + rank + 1)
+            if cid not in fused:
+                fused[cid] = dict(item)
+            elif item.get("bm25") is not None:
+                fused[cid]["bm25"] = item["bm25"]
+    ordered = sorted(fused, key=lambda cid: -scores[cid])[:k]
+    return [{**fused[cid], "rrf": scores[cid]} for cid in ordered]
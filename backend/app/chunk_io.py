@@ -0,0 +1,64 @@
+import json
+import os
+from typing import Any, Dict, Iterable, Iterator, List, TypeVar
+
+
+T = TypeVar("T")
+
+
+def is_jsonl(path: str) -> bool:
+    return str(path).lower().endswith(".jsonl")
+
+
+def iter_chunks(path: str) -> Iterator[Dict[str, Any]]:
+    # JSONL is read one line at a time; a legacy .json array has to be parsed whole
+    if is_jsonl(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            yield from json.load(f)
+
+
+def count_chunks(path: str) -> int:
+    if is_jsonl(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return sum(1 for line in f if line.strip())
+    return sum(1 for _ in iter_chunks(path))
+
+
+def write_chunks(path: str, chunks: Iterable[Dict[str, Any]]) -> int:
+    # Streams to a temp file and swaps it in, so readers never see a partial file.
+    # .json output is still written item by item as one array.
+    os.makedirs(os.path.dirname(str(path)) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    count = 0
+    with open(tmp, "w", encoding="utf-8") as f:
+        if is_jsonl(path):
+            for ch in chunks:
+                f.write(json.dumps(ch, ensure_ascii=False))
+                f.write("\n")
+                count += 1
+        else:
+            f.write("[")
+            for ch in chunks:
+                if count:
+                    f.write(", ")
+                f.write(json.dumps(ch, ensure_ascii=False))
+                count += 1
+            f.write("]")
+    os.replace(tmp, path)
+    return count
+
+
+def iter_batches(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    batch: List[T] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
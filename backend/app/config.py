@@ -11,25 +11,94 @@ class Settings(BaseSettings):
     environment: str = os.getenv("ENVIRONMENT", "dev")
 
     # Vector store / embeddings
+    rag_backend: str = os.getenv("RAG_BACKEND", "chroma")  # chroma | numpy
+    numpy_index_dir: str = os.getenv("NUMPY_INDEX_DIR", str(BASE_DIR / "embeddings"))
+    numpy_index_dtype: str = os.getenv("NUMPY_INDEX_DTYPE", "float32")  # float32 | float16 | int8
+    numpy_rerank_candidates: int = int(os.getenv("NUMPY_RERANK_CANDIDATES", "50"))
     embedding_model_name: str = os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
     vector_store_dir: str = os.getenv("VECTOR_STORE_DIR", str(BASE_DIR / "embeddings" / "vector_store"))
     pdf_chunks_path: str = os.getenv("PDF_CHUNKS_PATH", str(BASE_DIR / "embeddings" / "chunks.json"))
+    rag_index_manifest_path: str = os.getenv("RAG_INDEX_MANIFEST_PATH", str(BASE_DIR / "embeddings" / "index_manifest.json"))
+    rag_index_batch_size: int = int(os.getenv("RAG_INDEX_BATCH_SIZE", "256"))
+    rag_warmup_on_startup: bool = os.getenv("RAG_WARMUP_ON_STARTUP", "true").lower() in ("1", "true", "yes")
 
     # Patient data
-    patient_reports_path: str = os.getenv("PATIENT_REPORTS_PATH", str(BASE_DIR / "patient_data" / "patient_reports.json"))
+    patient_reports_path: str = os.getenv("PATIENT_REPORTS_PATH", str(BASE_DIR / "patient_data" / "patient_reports.json"))  # .json | .sqlite3
+    # Seed dummy patients into an empty store (defaults to on only when ENVIRONMENT=dev)
+    patient_seed_demo_data: bool = os.getenv(
+        "PATIENT_SEED_DEMO_DATA", "true" if os.getenv("ENVIRONMENT", "dev") == "dev" else "false"
+    ).lower() in ("1", "true", "yes")
     min_patient_records: int = int(os.getenv("MIN_PATIENT_RECORDS", "25"))
+    patient_lookup_limit: int = int(os.getenv("PATIENT_LOOKUP_LIMIT", "10"))
+    patient_fuzzy_min_score: float = float(os.getenv("PATIENT_FUZZY_MIN_SCORE", "0.3"))
 
     # Logging
     agent_audit_log_path: str = os.getenv("AGENT_AUDIT_LOG_PATH", str(BASE_DIR / "logs" / "agent_audit.json"))
     error_log_path: str = os.getenv("ERROR_LOG_PATH", str(BASE_DIR / "logs" / "error.log"))
+    log_queue_size: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    log_batch_size: int = int(os.getenv("LOG_BATCH_SIZE", "256"))
+    log_flush_interval_ms: int = int(os.getenv("LOG_FLUSH_INTERVAL_MS", "200"))
+    # Longest an error record waits for queue room before it is dropped (runs on the event loop)
+    log_error_block_ms: int = int(os.getenv("LOG_ERROR_BLOCK_MS", "5"))
+    log_rotate_max_bytes: int = int(os.getenv("LOG_ROTATE_MAX_BYTES", str(64 * 1024 * 1024)))
+    log_rotate_interval_seconds: int = int(os.getenv("LOG_ROTATE_INTERVAL_SECONDS", str(24 * 60 * 60)))
+    log_index_stride: int = int(os.getenv("LOG_INDEX_STRIDE", "256"))
+    # Records are stamped before they are queued, so a file is only nearly sorted;
+    # range reads look this far past `since`/`until` for stragglers
+    log_timestamp_slack_ms: int = int(os.getenv("LOG_TIMESTAMP_SLACK_MS", "2000"))
+
+    # Metrics (per-stage latency histograms served at /metrics)
+    metrics_enabled: bool = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+    metrics_buckets_ms: str = os.getenv("METRICS_BUCKETS_MS", "0.05,0.1,0.25,0.5,1,2.5,5,10,25,50,100,250,500,1000,2500,5000,10000")
+
+    # Sessions
+    session_backend: str = os.getenv("SESSION_BACKEND", "memory")  # memory | sqlite
+    session_db_path: str = os.getenv("SESSION_DB_PATH", str(BASE_DIR / "sessions" / "sessions.sqlite3"))
+    session_ttl_seconds: int = int(os.getenv("SESSION_TTL_SECONDS", str(60 * 60 * 6)))
+    session_max_entries: int = int(os.getenv("SESSION_MAX_ENTRIES", "10000"))
+    session_max_history: int = int(os.getenv("SESSION_MAX_HISTORY", "50"))
 
     # Retrieval
     num_retrieval_results: int = int(os.getenv("NUM_RETRIEVAL_RESULTS", "4"))
     min_chunk_words: int = int(os.getenv("MIN_CHUNK_WORDS", "300"))
     max_chunk_words: int = int(os.getenv("MAX_CHUNK_WORDS", "500"))
+    rag_cache_size: int = int(os.getenv("RAG_CACHE_SIZE", "1024"))
+    rag_cache_ttl_seconds: int = int(os.getenv("RAG_CACHE_TTL_SECONDS", "3600"))
+    rag_cache_version_check_seconds: int = int(os.getenv("RAG_CACHE_VERSION_CHECK_SECONDS", "30"))
+    rag_max_distance: float | None = float(os.environ["RAG_MAX_DISTANCE"]) if os.getenv("RAG_MAX_DISTANCE") else None
+    rag_batching_enabled: bool = os.getenv("RAG_BATCHING_ENABLED", "true").lower() in ("1", "true", "yes")
+    rag_batch_max_size: int = int(os.getenv("RAG_BATCH_MAX_SIZE", "32"))
+    rag_batch_max_wait_ms: int = int(os.getenv("RAG_BATCH_MAX_WAIT_MS", "5"))
+    rag_batch_timeout_ms: int = int(os.getenv("RAG_BATCH_TIMEOUT_MS", "30000"))
+    # Hybrid retrieval: BM25 over the chunks file fused with dense results (RRF)
+    rag_hybrid_enabled: bool = os.getenv("RAG_HYBRID_ENABLED", "true").lower() in ("1", "true", "yes")
+    rag_bm25_k1: float = float(os.getenv("RAG_BM25_K1", "1.5"))
+    rag_bm25_b: float = float(os.getenv("RAG_BM25_B", "0.75"))
+    rag_rrf_k: int = int(os.getenv("RAG_RRF_K", "60"))
+    rag_hybrid_dense_top_k: int = int(os.getenv("RAG_HYBRID_DENSE_TOP_K", "0"))  # 0 = same as top_k
+    rag_hybrid_lexical_top_k: int = int(os.getenv("RAG_HYBRID_LEXICAL_TOP_K", "20"))
+    rag_lexical_skip_ratio: float = float(os.getenv("RAG_LEXICAL_SKIP_RATIO", "2.0"))  # 0 disables skipping
+    rag_lexical_skip_min_score: float = float(os.getenv("RAG_LEXICAL_SKIP_MIN_SCORE", "0"))
+
+    # Clinical agent
+    clinical_turn_deadline_ms: int = int(os.getenv("CLINICAL_TURN_DEADLINE_MS", "8000"))
+    clinical_web_search_mode: str = os.getenv("CLINICAL_WEB_SEARCH_MODE", "fallback")  # fallback | parallel
+
+    # Thread pools for blocking work (model inference / file and DB I/O / outbound HTTP)
+    executor_inference_workers: int = int(os.getenv("EXECUTOR_INFERENCE_WORKERS", "4"))
+    executor_io_workers: int = int(os.getenv("EXECUTOR_IO_WORKERS", "16"))
+    executor_http_workers: int = int(os.getenv("EXECUTOR_HTTP_WORKERS", "8"))
 
     # Web search
     web_search_results: int = int(os.getenv("WEB_SEARCH_RESULTS", "5"))
+    web_search_provider: str = os.getenv("WEB_SEARCH_PROVIDER", "ddgs")  # ddgs | fixture
+    web_search_fixture_path: str = os.getenv("WEB_SEARCH_FIXTURE_PATH", str(BASE_DIR / "fixtures" / "web_search.json"))
+    web_search_cache_path: str = os.getenv("WEB_SEARCH_CACHE_PATH", str(BASE_DIR / "cache" / "web_search.sqlite3"))
+    web_search_cache_ttl_seconds: int = int(os.getenv("WEB_SEARCH_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+    web_search_memory_cache_size: int = int(os.getenv("WEB_SEARCH_MEMORY_CACHE_SIZE", "512"))
+    web_search_timeout_seconds: int = int(os.getenv("WEB_SEARCH_TIMEOUT_SECONDS", "5"))
+    web_search_breaker_failures: int = int(os.getenv("WEB_SEARCH_BREAKER_FAILURES", "3"))
+    web_search_breaker_reset_seconds: int = int(os.getenv("WEB_SEARCH_BREAKER_RESET_SECONDS", "60"))
 
 
 settings = Settings()
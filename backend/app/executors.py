@@ -0,0 +1,86 @@
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, TypeVar
+
+from .config import settings
+
+
+T = TypeVar("T")
+
+# Separate pools per kind of blocking work so a slow web search can't starve
+# patient lookups or model inference of threads.
+_POOL_SIZES = {
+    "inference": lambda: settings.executor_inference_workers,
+    "io": lambda: settings.executor_io_workers,
+    "http": lambda: settings.executor_http_workers,
+}
+_pools: Dict[str, ThreadPoolExecutor] = {}
+# Configured size and submitted-but-unfinished calls per pool, kept here rather
+# than read from ThreadPoolExecutor internals
+_sizes: Dict[str, int] = {}
+_in_flight: Dict[str, int] = {}
+_lock = threading.Lock()
+
+
+def get_executor(kind: str) -> ThreadPoolExecutor:
+    pool = _pools.get(kind)
+    if pool is None:
+        with _lock:
+            pool = _pools.get(kind)
+            if pool is None:
+                size = _POOL_SIZES[kind]()
+                pool = ThreadPoolExecutor(max_workers=size, thread_name_prefix=f"{kind}-pool")
+                _pools[kind] = pool
+                _sizes[kind] = size
+                _in_flight.setdefault(kind, 0)
+    return pool
+
+
+async def run_in(kind: str, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    # Carry contextvars (the request id) into the worker thread, as asyncio.to_thread does
+    ctx = contextvars.copy_context()
+    pool = get_executor(kind)
+    _track(kind, 1)
+    fut = pool.submit(partial(ctx.run, fn, *args, **kwargs))
+    # Counted until the call finishes in its thread (or is cancelled before
+    # starting), even if the awaiting request gave up earlier
+    fut.add_done_callback(lambda _: _track(kind, -1))
+    return await asyncio.wrap_future(fut)
+
+
+def _track(kind: str, delta: int) -> None:
+    with _lock:
+        _in_flight[kind] = _in_flight.get(kind, 0) + delta
+
+
+async def run_inference(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    return await run_in("inference", fn, *args, **kwargs)
+
+
+async def run_io(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    return await run_in("io", fn, *args, **kwargs)
+
+
+async def run_http(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    return await run_in("http", fn, *args, **kwargs)
+
+
+def executor_stats() -> Dict[str, Dict[str, int]]:
+    with _lock:
+        snapshot = {kind: (_sizes[kind], _in_flight.get(kind, 0)) for kind in _pools}
+    return {
+        kind: {"max_workers": size, "in_flight": n, "busy": min(n, size), "queued": max(0, n - size)}
+        for kind, (size, n) in snapshot.items()
+    }
+
+
+def shutdown_executors() -> None:
+    with _lock:
+        pools = list(_pools.values())
+        _pools.clear()
+        _sizes.clear()
+    for pool in pools:
+        pool.shutdown(wait=False, cancel_futures=True)
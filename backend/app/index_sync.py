@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+
+MANIFEST_VERSION = 1
+HASH_KEY = "content_hash"
+
+# Given the ids and chunks to upsert, returns one embedding per chunk. Without it
+# the collection's own embedding function embeds the documents.
+EmbedChunks = Callable[[List[str], List[Dict[str, Any]]], List[Any]]
+
+
+def chunk_id(chunk: Dict[str, Any], position: int) -> str:
+    return str(chunk.get("id", position))
+
+
+def chunk_hash(chunk: Dict[str, Any]) -> str:
+    # Covers text and metadata, so a moved page or renamed section is re-upserted too
+    payload = json.dumps(chunk, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def chunk_metadata(chunk: Dict[str, Any], content_hash: str) -> Dict[str, Any]:
+    # Chroma rejects None metadata values (e.g. a chunk before the first section header)
+    meta = {k: v for k, v in chunk.items() if k != "text" and v is not None}
+    meta[HASH_KEY] = content_hash
+    return meta
+
+
+def _manifest_identity(collection_name: str, model: str, store: str) -> Dict[str, Any]:
+    return {"version": MANIFEST_VERSION, "collection": collection_name, "model": model, "store": store}
+
+
+def load_manifest(path: str, collection_name: str, model: str, store: str = "") -> Dict[str, str] | None:
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    # A manifest written for another store, collection or model says nothing about this one
+    identity = _manifest_identity(collection_name, model, store)
+    if any(data.get(k) != v for k, v in identity.items()):
+        return None
+    return dict(data.get("chunks", {}))
+
+
+def write_manifest(path: str, collection_name: str, model: str, hashes: Dict[str, str], store: str = "") -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({**_manifest_identity(collection_name, model, store), "chunks": hashes}, f)
+    os.replace(tmp, path)
+
+
+def _collection_hashes(collection: Any, page_size: int) -> Dict[str, str]:
+    # Slow path when the manifest is missing or belongs to another index: read the
+    # hashes back from the stored metadata (legacy entries without one get "")
+    hashes: Dict[str, str] = {}
+    offset = 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        ids = page.get("ids") or []
+        for cid, meta in zip(ids, page.get("metadatas") or [{}] * len(ids)):
+            hashes[cid] = (meta or {}).get(HASH_KEY, "")
+        if len(ids) < page_size:
+            return hashes
+        offset += page_size
+
+
+def max_batch_size(client: Any, requested: int) -> int:
+    # Chroma rejects add/upsert calls above its own limit (SQLite variable count)
+    limit = None
+    getter = getattr(client, "get_max_batch_size", None)
+    if callable(getter):
+        try:
+            limit = getter()
+        except Exception:
+            limit = None
+    return max(1, min(requested, limit)) if limit else max(1, requested)
+
+
+def sync_collection(
+    collection: Any,
+    chunks: Iterable[Dict[str, Any]],
+    manifest_path: str,
+    model: str,
+    store: str = "",
+    embed: EmbedChunks | None = None,
+    batch_size: int = 256,
+    checkpoint_every: int = 10,
+    progress: Callable[[Dict[str, Any]], None] | None = None,
+) -> Dict[str, Any]:
+    # Brings `collection` in line with `chunks`: only new or changed chunks are
+    # embedded and upserted, chunks no longer present are deleted. `chunks` is
+    # consumed once as a stream; only ids and hashes are kept in memory.
+    #
+    # Batch N+1 is embedded on a worker thread while batch N is upserted, and the
+    # manifest is checkpointed every `checkpoint_every` batches with what has been
+    # applied so far, so an interrupted load resumes where it stopped.
+    current = load_manifest(manifest_path, collection.name, model, store)
+    # A count mismatch means the store changed behind the manifest (e.g. wiped)
+    if current is None or len(current) != collection.count():
+        current = _collection_hashes(collection, batch_size)
+
+    desired: Dict[str, str] = {}
+    applied = dict(current)
+    stats: Dict[str, Any] = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+    started = time.monotonic()
+    upserted = 0
+
+    def changed_batches() -> Iterator[Tuple[List[str], List[Dict[str, Any]], List[str]]]:
+        ids: List[str] = []
+        batch: List[Dict[str, Any]] = []
+        hashes: List[str] = []
+        for i, ch in enumerate(chunks):
+            cid = chunk_id(ch, i)
+            if cid in desired:
+                raise ValueError(f"Duplicate chunk id '{cid}'")
+            desired[cid] = chunk_hash(ch)
+            previous = current.get(cid)
+            if previous == desired[cid]:
+                stats["unchanged"] += 1
+                continue
+            stats["added" if previous is None else "updated"] += 1
+            ids.append(cid)
+            batch.append(ch)
+            hashes.append(desired[cid])
+            if len(batch) >= batch_size:
+                yield ids, batch, hashes
+                ids, batch, hashes = [], [], []
+        if batch:
+            yield ids, batch, hashes
+
+    def prepare(item: Tuple[List[str], List[Dict[str, Any]], List[str]]) -> Dict[str, Any]:
+        ids, batch, hashes = item
+        kwargs: Dict[str, Any] = {
+            "ids": ids,
+            "documents": [ch.get("text", "") for ch in batch],
+            "metadatas": [chunk_metadata(ch, h) for ch, h in zip(batch, hashes)],
+        }
+        if embed is not None:
+            kwargs["embeddings"] = [list(map(float, e)) for e in embed(ids, batch)]
+        return kwargs
+
+    batches = changed_batches()
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="index-embed") as pool:
+        item = next(batches, None)
+        pending = pool.submit(prepare, item) if item is not None else None
+        done = 0
+        while pending is not None:
+            kwargs = pending.result()
+            item = next(batches, None)
+            pending = pool.submit(prepare, item) if item is not None else None
+            collection.upsert(**kwargs)
+            applied.update((cid, m[HASH_KEY]) for cid, m in zip(kwargs["ids"], kwargs["metadatas"]))
+            upserted += len(kwargs["ids"])
+            done += 1
+            if checkpoint_every > 0 and done % checkpoint_every == 0:
+                write_manifest(manifest_path, collection.name, model, applied, store)
+            if progress is not None:
+                elapsed = time.monotonic() - started
+                progress({"upserted": upserted, "elapsed_s": elapsed, "chunks_per_s": upserted / elapsed if elapsed else 0.0})
+
+    removed = [cid for cid in current if cid not in desired]
+    for start in range(0, len(removed), batch_size):
+        collection.delete(ids=removed[start : start + batch_size])
+    stats["removed"] = len(removed)
+
+    write_manifest(manifest_path, collection.name, model, desired, store)
+    elapsed = time.monotonic() - started
+    stats["elapsed_s"] = round(elapsed, 3)
+    stats["chunks_per_s"] = round(upserted / elapsed, 1) if elapsed else 0.0
+    return stats
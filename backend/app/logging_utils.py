@@ -1,36 +1,490 @@
+import atexit
 import json
 import os
-from datetime import datetime
-from typing import Any, Dict
+import queue
+import re
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Tuple
 from .config import settings
+from .metrics import current_request_id, observe_stage
 
 
-def _ensure_file(path: str) -> None:
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    if not os.path.exists(path):
-        with open(path, "w", encoding="utf-8") as f:
-            f.write("")
+_FLUSH = "__flush__"
+_STOP = "__stop__"
+_TS_PREFIX = b'{"timestamp": "'
+
+
+def timestamp_key(ts: str) -> str:
+    # isoformat() drops the fraction when microseconds are 0; pad so keys sort as strings
+    if ts.endswith("Z") and "." not in ts:
+        return ts[:-1] + ".000000Z"
+    return ts
+
+
+def parse_timestamp_key(value: str) -> str:
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def shift_timestamp_key(key: str, ms: float) -> str:
+    return (datetime.fromisoformat(key[:-1]) + timedelta(milliseconds=ms)).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def _line_timestamp(line: bytes) -> str | None:
+    # Records are written with "timestamp" as the first key; avoid a full JSON parse
+    if line.startswith(_TS_PREFIX):
+        end = line.find(b'"', len(_TS_PREFIX))
+        if end > 0:
+            return timestamp_key(line[len(_TS_PREFIX) : end].decode("ascii", "replace"))
+    try:
+        ts = json.loads(line).get("timestamp")
+    except (ValueError, AttributeError):
+        return None
+    return timestamp_key(ts) if isinstance(ts, str) else None
+
+
+def _segment_pattern(path: str) -> re.Pattern:
+    stem, suffix = os.path.splitext(os.path.basename(path))
+    return re.compile(rf"^{re.escape(stem)}\.(\d{{8}}T\d{{12}}){re.escape(suffix)}$")
+
+
+def _segment_path(path: str, when: datetime) -> str:
+    stem, suffix = os.path.splitext(path)
+    return f"{stem}.{when.strftime('%Y%m%dT%H%M%S%f')}{suffix}"
+
+
+def _index_path(segment: str) -> str:
+    return segment + ".idx"
+
+
+def _empty_index() -> Dict[str, Any]:
+    return {"first_ts": None, "last_ts": None, "count": 0, "bytes": 0, "samples": []}
+
+
+def build_segment_index(segment: str, stride: int, idx: Dict[str, Any] | None = None) -> Dict[str, Any]:
+    # Given an earlier index of the same file, only the bytes appended since are scanned
+    idx = _empty_index() if idx is None else {**idx, "samples": list(idx["samples"])}
+    with open(segment, "rb") as f:
+        f.seek(idx["bytes"])
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # partially written tail, indexed on a later call
+            ts = _line_timestamp(line)
+            if ts is not None:
+                if idx["count"] % stride == 0:
+                    idx["samples"].append([ts, idx["bytes"]])
+                idx["first_ts"] = idx["first_ts"] or ts
+                idx["last_ts"] = ts
+                idx["count"] += 1
+            idx["bytes"] += len(line)
+    return idx
+
+
+class _LogSegmentFile:
+    # Active segment of one log file: tracks size/age for rotation and a sparse
+    # (timestamp, byte offset) index that is written next to each rotated segment.
+    # Rotation assumes this process is the file's only writer: another process
+    # appending to the same path keeps writing into the renamed segment, past the
+    # index written for it. Give each worker process its own log paths.
+    def __init__(self, path: str, max_bytes: int, max_age: float, stride: int) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.stride = max(1, stride)
+        self.rotations = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size and max_bytes and size >= max_bytes:
+            # Oversized file from an earlier run: seal it now, readers index it on first use
+            os.replace(path, _segment_path(path, datetime.utcnow()))
+            size = 0
+        self.index = build_segment_index(path, self.stride) if size else _empty_index()
+        # Offsets of new records continue from the real end, past any torn tail line
+        self.index["bytes"] = size
+        self._open()
+
+    def _open(self) -> None:
+        self.f = open(self.path, "ab")
+        self.opened_at = time.monotonic()
+
+    def _should_rotate(self) -> bool:
+        if not self.index["count"]:
+            return False
+        if self.max_bytes and self.index["bytes"] >= self.max_bytes:
+            return True
+        return bool(self.max_age) and time.monotonic() - self.opened_at >= self.max_age
+
+    def rotate(self) -> None:
+        self.f.close()
+        segment = _segment_path(self.path, datetime.utcnow())
+        os.replace(self.path, segment)
+        with open(_index_path(segment), "w", encoding="utf-8") as f:
+            json.dump(self.index, f)
+        self.index = _empty_index()
+        self.rotations += 1
+        self._open()
+
+    def write(self, line: bytes, ts: str | None) -> None:
+        if self._should_rotate():
+            self.rotate()
+        idx = self.index
+        if ts is not None:
+            if idx["count"] % self.stride == 0:
+                idx["samples"].append([ts, idx["bytes"]])
+            idx["first_ts"] = idx["first_ts"] or ts
+            idx["last_ts"] = ts
+            idx["count"] += 1
+        self.f.write(line)
+        idx["bytes"] += len(line)
+
+    def snapshot(self) -> Dict[str, Any]:
+        idx = self.index
+        return {**idx, "samples": list(idx["samples"])}
+
+
+class BatchedLogWriter:
+    # Appends NDJSON records from a background thread so request threads only enqueue.
+    # One handle is kept open per log file; buffered lines are flushed when
+    # `batch_size` records are pending, every `flush_interval` seconds, and at shutdown.
+    def __init__(
+        self,
+        max_queue: int,
+        batch_size: int,
+        flush_interval: float,
+        rotate_max_bytes: int = 0,
+        rotate_interval: float = 0,
+        index_stride: int = 256,
+    ) -> None:
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.rotate_max_bytes = rotate_max_bytes
+        self.rotate_interval = rotate_interval
+        self.index_stride = index_stride
+        self._queue: "queue.Queue[Tuple[str, Any]]" = queue.Queue(maxsize=max_queue)
+        self._files: Dict[str, _LogSegmentFile] = {}
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        # Held around every file write/flush/close and the counters they update, so
+        # the writer thread, close() and post-close fallback writes never interleave
+        self._write_lock = threading.Lock()
+        self._closed = False
+        self.stats: Dict[str, int] = {"enqueued": 0, "written": 0, "dropped": 0, "blocked": 0, "batches": 0, "errors": 0}
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+                self._thread.start()
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def submit(self, path: str, payload: Dict[str, Any], block_timeout: float = 0.0) -> bool:
+        if self._closed:
+            # After shutdown records are written synchronously
+            with self._write_lock:
+                self._write_batch([(path, payload)])
+                self._close_files()
+            return True
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((path, payload))
+        except queue.Full:
+            if block_timeout <= 0:
+                self._count("dropped")
+                return False
+            # Bounded backpressure: callers include the event loop, so waiting for
+            # room is capped and the record is dropped (and counted) after that
+            self._count("blocked")
+            try:
+                self._queue.put((path, payload), timeout=block_timeout)
+            except queue.Full:
+                self._count("dropped")
+                return False
+        self._count("enqueued")
+        if self._closed:
+            # close() may have drained the queue just before this record landed
+            self._drain()
+        return True
+
+    def _file(self, path: str) -> _LogSegmentFile:
+        lf = self._files.get(path)
+        if lf is None:
+            lf = _LogSegmentFile(path, self.rotate_max_bytes, self.rotate_interval, self.index_stride)
+            self._files[path] = lf
+        return lf
+
+    def _write_batch(self, batch: list) -> None:
+        started = time.perf_counter()
+        for path, payload in batch:
+            try:
+                ts = payload.get("timestamp")
+                line = (json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8")
+                self._file(path).write(line, timestamp_key(ts) if ts else None)
+                self.stats["written"] += 1
+            except Exception:
+                self.stats["errors"] += 1
+        self.stats["batches"] += 1
+        observe_stage("log_write", time.perf_counter() - started)
+
+    def _flush_all(self) -> None:
+        for lf in self._files.values():
+            try:
+                lf.f.flush()
+            except Exception:
+                self.stats["errors"] += 1
+
+    def _close_files(self) -> None:
+        self._flush_all()
+        for lf in self._files.values():
+            lf.f.close()
+        self._files.clear()
+
+    def _drain(self) -> None:
+        with self._write_lock:
+            batch = []
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item[0] in (_FLUSH, _STOP):
+                    item[1].set()
+                else:
+                    batch.append(item)
+            if batch:
+                self._write_batch(batch)
+            self._close_files()
+
+    def _run(self) -> None:
+        pending = 0
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                if pending:
+                    with self._write_lock:
+                        self._flush_all()
+                    pending, last_flush = 0, time.monotonic()
+                continue
+            batch = []
+            control = None
+            while True:
+                if item[0] in (_FLUSH, _STOP):
+                    control = item
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                with self._write_lock:
+                    self._write_batch(batch)
+                pending += len(batch)
+            if control is not None or pending >= self.batch_size or time.monotonic() - last_flush >= self.flush_interval:
+                with self._write_lock:
+                    self._flush_all()
+                pending, last_flush = 0, time.monotonic()
+            if control is not None:
+                control[1].set()
+                if control[0] == _STOP:
+                    return
+
+    def _send_control(self, kind: str, timeout: float) -> None:
+        done = threading.Event()
+        self._queue.put((kind, done))
+        done.wait(timeout)
+
+    def flush(self, timeout: float = 5.0) -> None:
+        if self._thread is not None and not self._closed:
+            self._send_control(_FLUSH, timeout)
+
+    def close(self, timeout: float = 5.0) -> None:
+        # Closed first, so new records take the synchronous path; anything the
+        # writer thread didn't get to is written here
+        with self._start_lock:
+            if self._closed:
+                return
+            self._closed = True
+        if self._thread is not None:
+            self._send_control(_STOP, timeout)
+            self._thread.join(timeout)
+        self._drain()
+
+    def active_index(self, path: str) -> Dict[str, Any] | None:
+        lf = self._files.get(path)
+        return lf.snapshot() if lf is not None else None
+
+    def snapshot(self) -> Dict[str, int]:
+        rotations = sum(lf.rotations for lf in list(self._files.values()))
+        return {**self.stats, "rotations": rotations, "queued": self._queue.qsize()}
+
+
+_writer = BatchedLogWriter(
+    max_queue=settings.log_queue_size,
+    batch_size=settings.log_batch_size,
+    flush_interval=settings.log_flush_interval_ms / 1000.0,
+    rotate_max_bytes=settings.log_rotate_max_bytes,
+    rotate_interval=settings.log_rotate_interval_seconds,
+    index_stride=settings.log_index_stride,
+)
+atexit.register(_writer.close)
+
+
+def log_writer_stats() -> Dict[str, int]:
+    return _writer.snapshot()
+
+
+def flush_logs() -> None:
+    _writer.flush()
+
+
+def shutdown_log_writer() -> None:
+    _writer.close()
+
+
+def list_log_segments(path: str) -> List[str]:
+    # Rotated segments in chronological order, followed by the active file
+    directory = os.path.dirname(path)
+    pattern = _segment_pattern(path)
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    rotated = sorted((m.group(1), n) for n in names if (m := pattern.match(n)))
+    segments = [os.path.join(directory, n) for _, n in rotated]
+    if os.path.exists(path):
+        segments.append(path)
+    return segments
+
+
+# Active files this process isn't writing (e.g. read before the first write):
+# path -> (inode, index), extended as the file grows instead of rescanned
+_active_indexes: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+_active_indexes_lock = threading.Lock()
+
+
+def _cached_active_index(path: str) -> Dict[str, Any]:
+    st = os.stat(path)
+    with _active_indexes_lock:
+        cached = _active_indexes.get(path)
+    idx = None
+    if cached is not None and cached[0] == st.st_ino and cached[1]["bytes"] <= st.st_size:
+        idx = cached[1]
+        if idx["bytes"] == st.st_size:
+            return idx
+    # Rotated (new inode) or truncated files are indexed from the start
+    idx = build_segment_index(path, settings.log_index_stride, idx)
+    with _active_indexes_lock:
+        _active_indexes[path] = (st.st_ino, idx)
+    return idx
+
+
+def segment_index(segment: str, active_path: str | None = None) -> Dict[str, Any]:
+    if segment == active_path:
+        idx = _writer.active_index(segment)
+        return idx if idx is not None else _cached_active_index(segment)
+    sidecar = _index_path(segment)
+    try:
+        with open(sidecar, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        pass
+    # Rotated without a sidecar (e.g. a legacy log sealed at startup): index once and persist
+    idx = build_segment_index(segment, settings.log_index_stride)
+    try:
+        with open(sidecar, "w", encoding="utf-8") as f:
+            json.dump(idx, f)
+    except OSError:
+        pass
+    return idx
+
+
+def iter_log_lines(
+    path: str,
+    since: str | None = None,
+    until: str | None = None,
+    types: List[str] | None = None,
+) -> Iterator[bytes]:
+    # Streams raw NDJSON lines across rotated segments. `since`/`until` are
+    # timestamp keys (see parse_timestamp_key); segments outside the range are
+    # skipped and reads seek to the nearest indexed offset before `since`. Both
+    # bounds are widened by LOG_TIMESTAMP_SLACK_MS when deciding where to seek and
+    # stop, so records stamped slightly out of order are still returned.
+    wanted = set(types) if types else None
+    slack = settings.log_timestamp_slack_ms
+    scan_since = shift_timestamp_key(since, -slack) if since else None
+    scan_until = shift_timestamp_key(until, slack) if until else None
+    for segment in list_log_segments(path):
+        idx = segment_index(segment, active_path=path)
+        if scan_since and idx["last_ts"] and idx["last_ts"] < scan_since:
+            continue
+        if scan_until and idx["first_ts"] and idx["first_ts"] > scan_until:
+            break
+        start = 0
+        if scan_since and idx["samples"]:
+            pos = bisect_left([s[0] for s in idx["samples"]], scan_since) - 1
+            if pos >= 0:
+                start = idx["samples"][pos][1]
+        try:
+            f = open(segment, "rb")
+        except FileNotFoundError:
+            continue
+        with f:
+            f.seek(start)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # partially written tail
+                if since or until:
+                    ts = _line_timestamp(line)
+                    if scan_until and ts is not None and ts > scan_until:
+                        return
+                    if ts is None or (since and ts < since) or (until and ts > until):
+                        continue
+                if wanted is not None:
+                    try:
+                        if json.loads(line).get("type") not in wanted:
+                            continue
+                    except ValueError:
+                        continue
+                yield line
+
+
+def _with_request_id(payload: Dict[str, Any]) -> None:
+    # Ties audit and error records to the HTTP request that produced them
+    rid = current_request_id()
+    if rid is not None:
+        payload.setdefault("request_id", rid)
 
 
 def log_agent_event(event: Dict[str, Any]) -> None:
-    _ensure_file(settings.agent_audit_log_path)
     payload = {
         "timestamp": datetime.utcnow().isoformat() + "Z",
         **event,
     }
-    with open(settings.agent_audit_log_path, "a", encoding="utf-8") as f:
-        f.write(json.dumps(payload, ensure_ascii=False) + "\n")
+    _with_request_id(payload)
+    _writer.submit(settings.agent_audit_log_path, payload)
 
 
 def log_error(message: str, extra: Dict[str, Any] | None = None) -> None:
-    _ensure_file(settings.error_log_path)
     payload = {
         "timestamp": datetime.utcnow().isoformat() + "Z",
         "level": "ERROR",
         "message": message,
         "extra": extra or {},
     }
-    with open(settings.error_log_path, "a", encoding="utf-8") as f:
-        f.write(json.dumps(payload, ensure_ascii=False) + "\n")
-
-
+    _with_request_id(payload)
+    _writer.submit(settings.error_log_path, payload, block_timeout=settings.log_error_block_ms / 1000.0)
@@ -1,6 +1,12 @@
+import json
+from contextlib import asynccontextmanager
+from itertools import islice
+from typing import Any, AsyncIterator, List
+
 from fastapi import FastAPI, Query, HTTPException
-from fastapi.responses import PlainTextResponse, FileResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from pydantic import BaseModel
 
 from .config import settings
 from .schemas import (
@@ -12,14 +18,25 @@ from .schemas import (
     ChatRequest,
     ChatResponse,
 )
-from .patient_utils import lookup_patient_by_name, load_patient_reports
-from .rag_retriever import RAGRetriever
-from .web_search import web_search
-from .agent_orchestration import handle_chat
-from .logging_utils import log_error
+from .patient_utils import lookup_patient_by_name, patient_count, search_patients_by_name
+from .rag_retriever import aretrieve, retriever_status, start_background_warmup
+from .web_search import web_search, web_search_stats
+from .agent_orchestration import handle_chat, sessions, stream_chat
+from .executors import executor_stats, run_http, run_io, shutdown_executors
+from .metrics import RequestMetricsMiddleware, metrics_snapshot, render_metrics
+from .logging_utils import flush_logs, iter_log_lines, log_error, log_writer_stats, parse_timestamp_key, shutdown_log_writer
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.rag_warmup_on_startup:
+        start_background_warmup()
+    yield
+    shutdown_executors()
+    shutdown_log_writer()
 
 
-app = FastAPI(title=settings.app_name)
+app = FastAPI(title=settings.app_name, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -27,19 +44,35 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
-
-retriever = RAGRetriever()
+app.add_middleware(RequestMetricsMiddleware)
 
 
 @app.get("/patients/lookup", response_model=PatientLookupResponse)
-def patients_lookup(name: str = Query(..., description="Patient name substring match")):
+async def patients_lookup(
+    name: str = Query(..., description="Patient name substring match"),
+    limit: int | None = Query(
+        None, ge=1, le=100, description="Maximum number of matches or fuzzy candidates (default PATIENT_LOOKUP_LIMIT)"
+    ),
+):
     try:
-        matches = lookup_patient_by_name(name)
+        matches = await run_io(lookup_patient_by_name, name)
         if not matches:
+            # Fall back to ranked trigram candidates so misspellings still surface a match
+            candidates = await run_io(search_patients_by_name, name, limit=limit)
+            if candidates:
+                return PatientLookupResponse(
+                    status="fuzzy",
+                    matches=[m for m, _ in candidates],
+                    scores=[score for _, score in candidates],
+                    message="No exact match; closest candidates",
+                )
             return PatientLookupResponse(status="not_found", matches=[], message="No patient found")
         if len(matches) > 1:
-            return PatientLookupResponse(status="multiple", matches=matches, message="Multiple matches")
+            return PatientLookupResponse(
+                status="multiple", matches=matches[: limit or settings.patient_lookup_limit], message="Multiple matches"
+            )
         return PatientLookupResponse(status="ok", matches=matches)
     except Exception as e:
         log_error("patients_lookup failed", {"error": str(e)})
@@ -47,9 +80,9 @@ def patients_lookup(name: str = Query(..., description="Patient name substring m
 
 
 @app.post("/rag/query", response_model=RAGQueryResponse)
-def rag_query(body: RAGQueryRequest):
+async def rag_query(body: RAGQueryRequest):
     try:
-        retrieved = retriever.retrieve(body.query, top_k=body.top_k)
+        retrieved = await aretrieve(body.query, top_k=body.top_k)
         if retrieved:
             citations = []
             for r in retrieved:
@@ -75,9 +108,9 @@ def rag_query(body: RAGQueryRequest):
 
 
 @app.post("/search/web", response_model=WebSearchResponse)
-def search_web(body: WebSearchRequest):
+async def search_web(body: WebSearchRequest):
     try:
-        results = web_search(body.query, body.max_results)
+        results = await run_http(web_search, body.query, body.max_results)
         return WebSearchResponse(results=results)
     except Exception as e:
         log_error("search_web failed", {"error": str(e)})
@@ -85,34 +118,80 @@ def search_web(body: WebSearchRequest):
 
 
 @app.post("/chat/session", response_model=ChatResponse)
-def chat_session(body: ChatRequest):
+async def chat_session(body: ChatRequest):
     try:
-        return handle_chat(body.session_id, body.message, body.patient_name)
+        return await handle_chat(body.session_id, body.message, body.patient_name)
     except Exception as e:
         log_error("chat_session failed", {"error": str(e)})
         raise HTTPException(status_code=500, detail="Internal error")
 
 
+def _sse(event: str, payload: Any) -> str:
+    data = payload.model_dump_json() if isinstance(payload, BaseModel) else json.dumps(payload, default=str)
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+@app.post("/chat/stream")
+async def chat_stream(body: ChatRequest):
+    # Server-Sent Events version of /chat/session: the receptionist step is sent
+    # as soon as it is done instead of waiting for retrieval
+    async def events() -> AsyncIterator[str]:
+        try:
+            async for event, payload in stream_chat(body.session_id, body.message, body.patient_name):
+                yield _sse(event, payload)
+        except Exception as e:
+            log_error("chat_stream failed", {"error": str(e)})
+            yield _sse("error", {"detail": "Internal error"})
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+
 @app.get("/health")
-def health():
+async def health():
     # touch patient db to ensure seeded
-    _ = load_patient_reports()
-    return {"status": "ok", "app": settings.app_name}
+    patients = await run_io(patient_count)
+    return {
+        "status": "ok",
+        "app": settings.app_name,
+        "patients": patients,
+        "rag": retriever_status(),
+        "audit_log": log_writer_stats(),
+        "sessions": await run_io(sessions.snapshot),
+        "web_search": web_search_stats(),
+        "executors": executor_stats(),
+    }
+
+
+@app.get("/metrics")
+async def metrics(format: str = Query("prometheus", pattern="^(prometheus|json)$")):
+    # Prometheus text exposition by default; ?format=json adds p50/p95/p99 estimates
+    if format == "json":
+        return metrics_snapshot()
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 
 @app.get("/logs/agent")
-def get_agent_logs(download: bool = False):
+async def get_agent_logs(
+    download: bool = False,
+    since: str | None = Query(None, description="ISO-8601 lower bound (inclusive)"),
+    until: str | None = Query(None, description="ISO-8601 upper bound (inclusive)"),
+    type: List[str] | None = Query(None, description="Only events of these types"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=100000),
+):
     try:
-        path = settings.agent_audit_log_path
+        since_key = parse_timestamp_key(since) if since else None
+        until_key = parse_timestamp_key(until) if until else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="since/until must be ISO-8601 timestamps")
+    try:
+        await run_io(flush_logs)
+        lines = iter_log_lines(settings.agent_audit_log_path, since=since_key, until=until_key, types=type)
         if download:
-            return FileResponse(path=path, media_type="text/plain", filename="agent_audit.ndjson")
-        with open(path, "r", encoding="utf-8") as f:
-            content = f.read()
-        return PlainTextResponse(content, media_type="text/plain")
-    except FileNotFoundError:
-        return PlainTextResponse("", media_type="text/plain")
+            headers = {"Content-Disposition": 'attachment; filename="agent_audit.ndjson"'}
+            return StreamingResponse(lines, media_type="text/plain", headers=headers)
+        return StreamingResponse(islice(lines, offset, offset + limit), media_type="text/plain")
     except Exception as e:
         log_error("get_agent_logs failed", {"error": str(e)})
         raise HTTPException(status_code=500, detail="Internal error")
-
-
@@ -0,0 +1,188 @@
+import bisect
+import contextvars
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Tuple
+
+from .config import settings
+
+
+_request_id: contextvars.ContextVar[str | None] = contextvars.ContextVar("request_id", default=None)
+
+
+def new_request_id(incoming: str | None = None) -> contextvars.Token:
+    # Honour a caller-supplied id (e.g. from a proxy) so traces line up across services
+    rid = (incoming or "").strip()[:64] or uuid.uuid4().hex
+    return _request_id.set(rid)
+
+
+def current_request_id() -> str | None:
+    return _request_id.get()
+
+
+def reset_request_id(token: contextvars.Token) -> None:
+    _request_id.reset(token)
+
+
+def _parse_buckets(spec: str) -> List[float]:
+    return sorted({float(b) / 1000.0 for b in spec.split(",") if b.strip()})
+
+
+class Histogram:
+    # Cumulative-bucket latency histogram (seconds) per label set, Prometheus style.
+    # observe() is a bisect plus a few additions under a lock, cheap enough for every request.
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...], buckets: List[float]) -> None:
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def observe(self, labels: Tuple[str, ...], seconds: float) -> None:
+        pos = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self._series[labels] = series
+            series[0][pos] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def _copy(self) -> Dict[Tuple[str, ...], List[Any]]:
+        with self._lock:
+            return {labels: [list(s[0]), s[1], s[2]] for labels, s in self._series.items()}
+
+    def _quantile(self, counts: List[int], total: int, q: float) -> float:
+        # Linear interpolation inside the bucket holding the q-th observation;
+        # the +Inf bucket reports its lower bound
+        rank = q * total
+        seen = 0
+        for i, c in enumerate(counts):
+            if c and seen + c >= rank:
+                if i == len(self.buckets):
+                    return self.buckets[-1] if self.buckets else 0.0
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / c
+            seen += c
+        return 0.0
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        out = []
+        for labels, (counts, total_s, n) in sorted(self._copy().items()):
+            out.append(
+                {
+                    **dict(zip(self.label_names, labels)),
+                    "count": n,
+                    "mean_ms": round(1000.0 * total_s / n, 3) if n else 0.0,
+                    "p50_ms": round(1000.0 * self._quantile(counts, n, 0.50), 3),
+                    "p95_ms": round(1000.0 * self._quantile(counts, n, 0.95), 3),
+                    "p99_ms": round(1000.0 * self._quantile(counts, n, 0.99), 3),
+                }
+            )
+        return out
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total_s, n) in sorted(self._copy().items()):
+            base = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, labels))
+            sep = "," if base else ""
+            cumulative = 0
+            for bound, c in zip(self.buckets, counts):
+                cumulative += c
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound:g}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {n}')
+            lines.append(f"{self.name}_sum{{{base}}} {total_s:.6f}")
+            lines.append(f"{self.name}_count{{{base}}} {n}")
+        return lines
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+_buckets = _parse_buckets(settings.metrics_buckets_ms)
+stage_latency = Histogram(
+    "app_stage_duration_seconds",
+    "Time spent in each stage of the request path",
+    ("stage",),
+    _buckets,
+)
+http_latency = Histogram(
+    "app_http_request_duration_seconds",
+    "End-to-end HTTP request latency by route",
+    ("method", "route", "status"),
+    _buckets,
+)
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    if settings.metrics_enabled:
+        stage_latency.observe((stage,), seconds)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    # Records the wall time of the block, including awaits when used in async code
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+
+class RequestMetricsMiddleware:
+    # Plain ASGI middleware: assigns the request id (echoed as X-Request-ID) and
+    # records end-to-end latency per route template. Unlike an @app.middleware
+    # function it also covers streaming bodies and keeps the contextvar visible
+    # to the endpoint and its generators. METRICS_ENABLED only turns off the
+    # histogram; log correlation by request id stays on.
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        incoming = dict(scope.get("headers") or []).get(b"x-request-id", b"").decode("latin-1")
+        token = new_request_id(incoming)
+        rid = current_request_id().encode("latin-1")
+        status = {"code": 500}
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message["headers"] = list(message.get("headers") or []) + [(b"x-request-id", rid)]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if settings.metrics_enabled:
+                route = scope.get("route")
+                # Route templates keep label cardinality bounded; unmatched paths share one series
+                path = getattr(route, "path", None) or "unmatched"
+                http_latency.observe((scope.get("method", ""), path, str(status["code"])), time.perf_counter() - started)
+            reset_request_id(token)
+
+
+def render_metrics() -> str:
+    return "\n".join(stage_latency.render() + http_latency.render()) + "\n"
+
+
+def metrics_snapshot() -> Dict[str, Any]:
+    return {"stages": stage_latency.snapshot(), "http": http_latency.snapshot()}
+
+
+def reset_metrics() -> None:
+    stage_latency.reset()
+    http_latency.reset()
@@ -0,0 +1,136 @@
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+
+import numpy as np
+
+from .chunk_io import iter_chunks
+from .config import settings
+from .quantization import QUANTIZED_DTYPES, cosine_scores, load_quantized, quantized_paths, row_norms, top_k
+from .retriever_base import BaseRetriever
+
+
+class NumpyRetriever(BaseRetriever):
+    # In-process exact cosine search over embeddings.npy (written by
+    # embeddings/generate_embeddings.py). The matrix is memory-mapped so worker
+    # processes share the OS page cache instead of each holding a private copy.
+    # With dtype float16/int8 the quantized copy written by
+    # embeddings/quantize_embeddings.py is searched instead, and the best
+    # `rerank_candidates` hits are re-scored against the float32 rows if present.
+    # `embed_fn` replaces the sentence-transformers model (e.g. for benchmarks).
+    def __init__(
+        self,
+        index_dir: str,
+        chunks_path: str,
+        dtype: str = "float32",
+        rerank_candidates: int = 0,
+        embed_fn: Callable[[List[str]], List[Any]] | None = None,
+    ) -> None:
+        if dtype != "float32" and dtype not in QUANTIZED_DTYPES:
+            raise ValueError(f"Unknown NUMPY_INDEX_DTYPE '{dtype}'")
+        self.index_dir = index_dir
+        self.chunks_path = chunks_path
+        self.dtype = dtype
+        self.rerank_candidates = rerank_candidates
+        self.embed_fn = embed_fn
+        self.float32_path = os.path.join(index_dir, "embeddings.npy")
+        self.embeddings_path = self.float32_path if dtype == "float32" else quantized_paths(index_dir, dtype)[0]
+        self.ids_path = os.path.join(index_dir, "ids.json")
+        self._model: Any = None
+        self._model_lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._signature: Tuple[int, int] | None = None
+        self._load()
+        super().__init__()
+
+    def _file_signature(self) -> Tuple[int, int]:
+        st = os.stat(self.embeddings_path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def _load(self) -> None:
+        with self._load_lock:
+            signature = self._file_signature()
+            if signature == self._signature:
+                return
+            if self.dtype == "float32":
+                matrix = np.load(self.embeddings_path, mmap_mode="r")
+            else:
+                matrix, _ = load_quantized(self.index_dir, self.dtype)
+            full = None
+            if matrix.dtype != np.float32 and self.rerank_candidates > 0 and os.path.exists(self.float32_path):
+                full = np.load(self.float32_path, mmap_mode="r")
+            with open(self.ids_path, "r", encoding="utf-8") as f:
+                ids: List[str] = json.load(f)
+            if len(ids) != matrix.shape[0]:
+                raise ValueError(f"{self.ids_path} has {len(ids)} ids but {self.embeddings_path} has {matrix.shape[0]} rows")
+            chunks_by_id: Dict[str, Dict[str, Any]] = {}
+            if os.path.exists(self.chunks_path):
+                for i, ch in enumerate(iter_chunks(self.chunks_path)):
+                    chunks_by_id[ch.get("id", str(i))] = ch
+            texts = []
+            metadatas = []
+            for cid in ids:
+                ch = chunks_by_id.get(cid, {})
+                texts.append(ch.get("text", ""))
+                metadatas.append({k: v for k, v in ch.items() if k != "text"})
+            # Row norms are computed once so queries only pay for the matmul
+            norms = row_norms(matrix)
+            # Swapped as one tuple so a concurrent search never mixes old and new data
+            self._index = (matrix, norms, full, ids, texts, metadatas)
+            self._signature = signature
+
+    def _encoder(self) -> Any:
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+
+                    self._model = SentenceTransformer(settings.embedding_model_name)
+        return self._model
+
+    def _index_version(self) -> Hashable:
+        # A regenerated embeddings.npy is picked up on the next version check
+        self._load()
+        return self._signature
+
+    def _embed(self, texts: List[str]) -> List[Any]:
+        if self.embed_fn is not None:
+            return list(self.embed_fn(texts))
+        vectors = self._encoder().encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+        return list(np.asarray(vectors, dtype=np.float32))
+
+    def _search(self, embeddings: List[Any], k: int) -> List[List[Dict[str, Any]]]:
+        matrix, norms, full, ids, texts, metadatas = self._index
+        if matrix.shape[0] == 0:
+            return [[] for _ in embeddings]
+        q = np.asarray(embeddings, dtype=np.float32)
+        q /= np.maximum(np.linalg.norm(q, axis=1, keepdims=True), 1e-12)
+        # (n, d) @ (d, b): one pass over the matrix for the whole batch
+        scores = cosine_scores(matrix, norms, q)
+        out: List[List[Dict[str, Any]]] = []
+        for col in range(scores.shape[1]):
+            s = scores[:, col]
+            if full is not None:
+                # Exact re-score of the quantized shortlist; only these rows are paged in
+                cand = np.sort(top_k(s, max(k, self.rerank_candidates)))
+                rows = np.asarray(full[cand], dtype=np.float32)
+                exact = (rows @ q[col]) / np.maximum(np.linalg.norm(rows, axis=1), 1e-12)
+                order = top_k(exact, k)
+                top, top_scores = cand[order], exact[order]
+            else:
+                top = top_k(s, k)
+                top_scores = s[top]
+            out.append(
+                [
+                    {
+                        "id": ids[i],
+                        "text": texts[i],
+                        "metadata": metadatas[i],
+                        # Squared L2 between unit vectors, matching Chroma's default distance
+                        "distance": float(2.0 - 2.0 * score),
+                    }
+                    for i, score in zip(top, top_scores)
+                ]
+            )
+        return out
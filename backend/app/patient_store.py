@@ -0,0 +1,494 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Any, Dict, List, Set, Tuple
+
+import numpy as np
+
+from .schemas import PatientReport
+
+
+def normalize_name(name: str) -> str:
+    return " ".join(name.lower().split())
+
+
+def name_trigrams(name: str) -> Set[str]:
+    padded = f"  {name} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def _prefix_range(vocab: List[str], prefix: str) -> List[str]:
+    out: List[str] = []
+    i = bisect_left(vocab, prefix)
+    while i < len(vocab) and vocab[i].startswith(prefix):
+        out.append(vocab[i])
+        i += 1
+    return out
+
+
+class NameIndex:
+    # Immutable token and trigram indexes over normalized patient names. Lookups
+    # return record positions, so a store can keep the reports themselves elsewhere.
+    def __init__(self, names: List[str]) -> None:
+        self.names = [normalize_name(n) for n in names]
+        self.postings: Dict[str, List[int]] = {}
+        by_name: Dict[str, List[int]] = {}
+        for idx, name in enumerate(self.names):
+            by_name.setdefault(name, []).append(idx)
+            for tok in set(name.split()):
+                self.postings.setdefault(tok, []).append(idx)
+        self.vocab = sorted(self.postings)
+        self.vocab_reversed = sorted(t[::-1] for t in self.postings)
+
+        # Trigrams are indexed per distinct name; records sharing a name are expanded after ranking
+        self.distinct_names = list(by_name)
+        self.name_records = list(by_name.values())
+        grams: Dict[str, List[int]] = {}
+        self.trigram_sizes = np.zeros(len(self.distinct_names), dtype=np.int32)
+        for nid, name in enumerate(self.distinct_names):
+            tg = name_trigrams(name)
+            self.trigram_sizes[nid] = len(tg)
+            for g in tg:
+                grams.setdefault(g, []).append(nid)
+        self.trigram_postings = {g: np.asarray(ids, dtype=np.int32) for g, ids in grams.items()}
+
+    def _union(self, tokens: List[str]) -> Set[int]:
+        out: Set[int] = set()
+        for tok in tokens:
+            out.update(self.postings.get(tok, ()))
+        return out
+
+    def find_substring(self, query: str) -> List[int]:
+        q = normalize_name(query)
+        if not q:
+            return list(range(len(self.names)))
+        tokens = q.split(" ")
+        if len(tokens) == 1:
+            # Query lies inside a single name token: scan the (small) vocabulary
+            candidates = self._union([t for t in self.vocab if tokens[0] in t])
+        else:
+            # "a b c" inside a name means: a is a token suffix, b an exact token, c a token prefix
+            head = tokens[0][::-1]
+            candidates = self._union([t[::-1] for t in _prefix_range(self.vocab_reversed, head)])
+            candidates &= self._union(_prefix_range(self.vocab, tokens[-1]))
+            for tok in tokens[1:-1]:
+                if not candidates:
+                    break
+                candidates &= set(self.postings.get(tok, ()))
+        return [i for i in sorted(candidates) if q in self.names[i]]
+
+    def search_fuzzy(self, query: str, limit: int = 10, min_score: float = 0.3) -> List[Tuple[int, float]]:
+        q = normalize_name(query)
+        if not q or not self.names or limit <= 0:
+            return []
+        qg = name_trigrams(q)
+        hits = [self.trigram_postings[g] for g in qg if g in self.trigram_postings]
+        if not hits:
+            return []
+        # Shared trigram counts per distinct name, scored as Jaccard similarity of trigram sets
+        shared = np.bincount(np.concatenate(hits), minlength=len(self.distinct_names))
+        cand = np.flatnonzero(shared)
+        scores = shared[cand] / (len(qg) + self.trigram_sizes[cand] - shared[cand])
+        keep = scores >= min_score
+        cand, scores = cand[keep], scores[keep]
+        if len(cand) > limit:
+            # Keep every name tying the limit-th score so the cut below follows name
+            # order; argpartition alone would pick arbitrarily among the tied names
+            kth = np.partition(scores, len(scores) - limit)[len(scores) - limit]
+            keep = scores >= kth
+            cand, scores = cand[keep], scores[keep]
+        out: List[Tuple[int, float]] = []
+        for i in np.lexsort((cand, -scores)):
+            for idx in self.name_records[int(cand[i])]:
+                if len(out) == limit:
+                    return out
+                out.append((idx, float(scores[i])))
+        return out
+
+
+class PatientStore(ABC):
+    # Common interface of the patient stores. Records are addressed by an integer
+    # id (list position for JSON, rowid for SQLite) for updates.
+    @abstractmethod
+    def count(self) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def reports(self) -> List[PatientReport]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def find_substring(self, query: str) -> List[PatientReport]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def search_fuzzy(self, query: str, limit: int = 10, min_score: float = 0.3) -> List[Tuple[PatientReport, float]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def find_records(
+        self, name: str | None = None, discharged_from: str | None = None, discharged_to: str | None = None
+    ) -> List[Tuple[int, PatientReport]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def append(self, reports: List[PatientReport]) -> List[int]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def update(self, record_id: int, report: PatientReport) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def replace_all(self, reports: List[PatientReport]) -> None:
+        raise NotImplementedError
+
+    def invalidate(self) -> None:
+        pass
+
+
+def _matches_filters(report: PatientReport, name: str | None, discharged_from: str | None, discharged_to: str | None) -> bool:
+    if name is not None and normalize_name(report.patient_name) != normalize_name(name):
+        return False
+    if discharged_from is not None and report.discharge_date < discharged_from:
+        return False
+    return discharged_to is None or report.discharge_date <= discharged_to
+
+
+class JSONPatientStore(PatientStore):
+    # Keeps the patient reports file resident in memory and reloads it only when
+    # the file's mtime/size signature changes. Writes rewrite the whole file.
+    def __init__(self, path: str) -> None:
+        self.path = path
+        # Re-entrant: writers hold it across read, write and replace, and reload inside
+        self._lock = threading.RLock()
+        self._signature: Tuple[int, int] | None = None
+        self._snapshot: Tuple[List[PatientReport], NameIndex] = ([], NameIndex([]))
+
+    def _stat_signature(self) -> Tuple[int, int] | None:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._signature = None
+
+    def _load(self) -> Tuple[List[PatientReport], NameIndex]:
+        sig = self._stat_signature()
+        if sig is not None and sig == self._signature:
+            return self._snapshot
+        with self._lock:
+            sig = self._stat_signature()
+            if sig is None or sig != self._signature:
+                raw: List[Dict] = []
+                if sig is not None:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        content = f.read().strip()
+                    if content:
+                        raw = json.loads(content)
+                reports = [PatientReport(**r) for r in raw]
+                self._snapshot = (reports, NameIndex([r.patient_name for r in reports]))
+                self._signature = sig
+            return self._snapshot
+
+    def _write(self, reports: List[PatientReport]) -> None:
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        # A unique temp file per write, so concurrent writers never share one
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=f"{os.path.basename(self.path)}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump([r.model_dump() for r in reports], f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self.invalidate()
+
+    def count(self) -> int:
+        return len(self._load()[0])
+
+    def reports(self) -> List[PatientReport]:
+        return list(self._load()[0])
+
+    def find_substring(self, query: str) -> List[PatientReport]:
+        reports, index = self._load()
+        return [reports[i] for i in index.find_substring(query)]
+
+    def search_fuzzy(self, query: str, limit: int = 10, min_score: float = 0.3) -> List[Tuple[PatientReport, float]]:
+        reports, index = self._load()
+        return [(reports[i], score) for i, score in index.search_fuzzy(query, limit=limit, min_score=min_score)]
+
+    def find_records(
+        self, name: str | None = None, discharged_from: str | None = None, discharged_to: str | None = None
+    ) -> List[Tuple[int, PatientReport]]:
+        reports = self._load()[0]
+        return [(i, r) for i, r in enumerate(reports) if _matches_filters(r, name, discharged_from, discharged_to)]
+
+    def append(self, reports: List[PatientReport]) -> List[int]:
+        with self._lock:
+            current = self.reports()
+            self._write(current + list(reports))
+        return list(range(len(current), len(current) + len(reports)))
+
+    def update(self, record_id: int, report: PatientReport) -> bool:
+        with self._lock:
+            current = self.reports()
+            if not 0 <= record_id < len(current):
+                return False
+            current[record_id] = report
+            self._write(current)
+        return True
+
+    def replace_all(self, reports: List[PatientReport]) -> None:
+        with self._lock:
+            self._write(list(reports))
+
+
+_LIST_FIELDS = ("medications", "dietary_restrictions", "follow_up_instructions", "warning_signs", "discharge_instructions")
+_COLUMNS = ("patient_name", "discharge_date", "diagnosis") + _LIST_FIELDS
+_INSERT = f"INSERT INTO patients (name_norm, {', '.join(_COLUMNS)}) VALUES ({', '.join('?' * (len(_COLUMNS) + 1))})"
+
+
+class _NameView:
+    # Name lookups over SQLite rows: an immutable NameIndex over the rows as last
+    # read, plus a small overlay with this process's own appends and updates since
+    # then (`masked` hides base positions whose row was updated). Results are ids.
+    def __init__(
+        self,
+        ids: np.ndarray,
+        index: NameIndex,
+        delta: Dict[int, str] | None = None,
+        masked: frozenset = frozenset(),
+    ) -> None:
+        self.ids = ids
+        self.index = index
+        self.delta_names = dict(sorted((delta or {}).items()))
+        self.delta_ids = list(self.delta_names)
+        self.delta = NameIndex(list(self.delta_names.values()))
+        self.masked = masked
+
+    def count(self) -> int:
+        return len(self.ids) - len(self.masked) + len(self.delta_ids)
+
+    def with_changes(self, changes: List[Tuple[int, str]]) -> "_NameView":
+        delta = dict(self.delta_names)
+        masked = set(self.masked)
+        for record_id, name in changes:
+            if record_id not in delta:
+                pos = int(np.searchsorted(self.ids, record_id))
+                if pos < len(self.ids) and self.ids[pos] == record_id:
+                    masked.add(pos)
+            delta[record_id] = name
+        return _NameView(self.ids, self.index, delta, frozenset(masked))
+
+    def find_substring(self, query: str) -> List[int]:
+        found = [int(self.ids[p]) for p in self.index.find_substring(query) if p not in self.masked]
+        if not self.delta_ids:
+            return found
+        return sorted(found + [self.delta_ids[p] for p in self.delta.find_substring(query)])
+
+    def search_fuzzy(self, query: str, limit: int, min_score: float) -> List[Tuple[int, float]]:
+        hits = [
+            (int(self.ids[p]), score, self.index.names[p])
+            for p, score in self.index.search_fuzzy(query, limit=limit + len(self.masked), min_score=min_score)
+            if p not in self.masked
+        ]
+        if self.delta_ids:
+            hits += [
+                (self.delta_ids[p], score, self.delta.names[p])
+                for p, score in self.delta.search_fuzzy(query, limit=limit, min_score=min_score)
+            ]
+            # The order a full rebuild gives: score, then each name's first record, then id
+            first: Dict[str, int] = {}
+            for record_id, _, name in hits:
+                first[name] = min(first.get(name, record_id), record_id)
+            hits.sort(key=lambda h: (-h[1], first[h[2]], h[0]))
+        return [(record_id, score) for record_id, score, _ in hits[:limit]]
+
+
+class SQLitePatientStore(PatientStore):
+    # Reports live in SQLite with B-tree indexes on the normalized name and the
+    # discharge date, so appends and updates touch single rows. Only the name
+    # index (names and rowids) is held in memory for substring/fuzzy lookups.
+    # Every write bumps a `generation` counter: this process's own appends and
+    # updates are patched into the in-memory view, and it is re-read from the
+    # table only when another process (or replace_all) has written, or the
+    # patches pile up. Each thread keeps its own connection (WAL mode).
+    def __init__(self, path: str, max_overlay: int = 1000) -> None:
+        self.path = path
+        self.max_overlay = max_overlay
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._generation: int | None = None
+        self._snapshot = _NameView(np.zeros(0, dtype=np.int64), NameIndex([]))
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS patients ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, name_norm TEXT NOT NULL, "
+                + ", ".join(f"{c} TEXT NOT NULL" for c in _COLUMNS)
+                + ")"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_patients_name_norm ON patients(name_norm)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_patients_discharge_date ON patients(discharge_date)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row(report: PatientReport) -> Tuple[str, ...]:
+        data = report.model_dump()
+        return (normalize_name(report.patient_name),) + tuple(
+            json.dumps(data[c], ensure_ascii=False) if c in _LIST_FIELDS else data[c] for c in _COLUMNS
+        )
+
+    @staticmethod
+    def _report(row: Tuple[Any, ...]) -> PatientReport:
+        data = dict(zip(_COLUMNS, row))
+        for c in _LIST_FIELDS:
+            data[c] = json.loads(data[c])
+        return PatientReport(**data)
+
+    def _bump(self, conn: sqlite3.Connection) -> int:
+        # Inside the write transaction, so the returned value is this write's generation
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+        return conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+
+    def _apply_own_write(self, generation: int, changes: List[Tuple[int, str]]) -> None:
+        with self._lock:
+            view = self._snapshot
+            # Anything else written since the view was read forces a full reload instead
+            if self._generation != generation - 1 or len(view.delta_ids) + len(changes) > self.max_overlay:
+                return
+            self._snapshot = view.with_changes(changes)
+            self._generation = generation
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation = None
+
+    def _load(self) -> _NameView:
+        generation = self._conn().execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+        if generation == self._generation:
+            return self._snapshot
+        with self._lock:
+            if generation != self._generation:
+                rows = self._conn().execute("SELECT id, patient_name FROM patients ORDER BY id").fetchall()
+                ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+                self._snapshot = _NameView(ids, NameIndex([r[1] for r in rows]))
+                self._generation = generation
+            return self._snapshot
+
+    def _fetch(self, ids: List[int], chunk_size: int = 500) -> Dict[int, PatientReport]:
+        found: Dict[int, PatientReport] = {}
+        conn = self._conn()
+        for start in range(0, len(ids), chunk_size):
+            part = ids[start : start + chunk_size]
+            marks = ",".join("?" * len(part))
+            for row in conn.execute(f"SELECT id, {', '.join(_COLUMNS)} FROM patients WHERE id IN ({marks})", part):
+                found[row[0]] = self._report(row[1:])
+        return found
+
+    def count(self) -> int:
+        # From the name view: COUNT(*) would scan the table on every lookup
+        return self._load().count()
+
+    def reports(self) -> List[PatientReport]:
+        rows = self._conn().execute(f"SELECT {', '.join(_COLUMNS)} FROM patients ORDER BY id")
+        return [self._report(row) for row in rows]
+
+    def find_substring(self, query: str) -> List[PatientReport]:
+        if not normalize_name(query):
+            return self.reports()
+        wanted = self._load().find_substring(query)
+        found = self._fetch(wanted)
+        # A row deleted by another process since the snapshot is simply skipped
+        return [found[i] for i in wanted if i in found]
+
+    def search_fuzzy(self, query: str, limit: int = 10, min_score: float = 0.3) -> List[Tuple[PatientReport, float]]:
+        hits = self._load().search_fuzzy(query, limit=limit, min_score=min_score)
+        found = self._fetch([i for i, _ in hits])
+        return [(found[i], score) for i, score in hits if i in found]
+
+    def find_records(
+        self, name: str | None = None, discharged_from: str | None = None, discharged_to: str | None = None
+    ) -> List[Tuple[int, PatientReport]]:
+        clauses: List[str] = []
+        params: List[str] = []
+        if name is not None:
+            clauses.append("name_norm = ?")
+            params.append(normalize_name(name))
+        if discharged_from is not None:
+            clauses.append("discharge_date >= ?")
+            params.append(discharged_from)
+        if discharged_to is not None:
+            clauses.append("discharge_date <= ?")
+            params.append(discharged_to)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._conn().execute(f"SELECT id, {', '.join(_COLUMNS)} FROM patients{where} ORDER BY id", params)
+        return [(row[0], self._report(row[1:])) for row in rows]
+
+    def append(self, reports: List[PatientReport]) -> List[int]:
+        conn = self._conn()
+        ids: List[int] = []
+        with conn:
+            for report in reports:
+                ids.append(int(conn.execute(_INSERT, self._row(report)).lastrowid))
+            generation = self._bump(conn)
+        self._apply_own_write(generation, [(i, r.patient_name) for i, r in zip(ids, reports)])
+        return ids
+
+    def update(self, record_id: int, report: PatientReport) -> bool:
+        conn = self._conn()
+        assignments = ", ".join(f"{c} = ?" for c in ("name_norm",) + _COLUMNS)
+        with conn:
+            changed = conn.execute(f"UPDATE patients SET {assignments} WHERE id = ?", (*self._row(report), record_id)).rowcount
+            if changed:
+                generation = self._bump(conn)
+        if changed:
+            self._apply_own_write(generation, [(record_id, report.patient_name)])
+        return bool(changed)
+
+    def replace_all(self, reports: List[PatientReport]) -> None:
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM patients")
+            conn.executemany(_INSERT, [self._row(r) for r in reports])
+            self._bump(conn)
+
+
+def is_sqlite_path(path: str) -> bool:
+    return os.path.splitext(str(path))[1].lower() in (".sqlite", ".sqlite3", ".db")
+
+
+def build_patient_store(path: str) -> PatientStore:
+    # PATIENT_REPORTS_PATH=...json keeps the legacy file; .sqlite3/.sqlite/.db selects SQLite
+    return SQLitePatientStore(path) if is_sqlite_path(path) else JSONPatientStore(path)
+
+
+def import_json(json_path: str, store: PatientStore, replace: bool = False) -> int:
+    with open(json_path, "r", encoding="utf-8") as f:
+        reports = [PatientReport(**r) for r in json.load(f)]
+    if replace:
+        store.replace_all(reports)
+    else:
+        store.append(reports)
+    return len(reports)
@@ -1,11 +1,12 @@
-import json
 import os
 import random
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Tuple
 
 from .config import settings
+from .metrics import timed
 from .schemas import PatientReport
+from .patient_store import build_patient_store
 
 
 DIAGNOSES = [
@@ -54,26 +55,28 @@ DISCHARGE_POOL = [
 ]
 
 
+_store = build_patient_store(settings.patient_reports_path)
+
+
 def _ensure_patient_db() -> None:
-    os.makedirs(os.path.dirname(settings.patient_reports_path), exist_ok=True)
-    if not os.path.exists(settings.patient_reports_path):
-        seed_dummy_patients(30)
-    else:
-        with open(settings.patient_reports_path, "r", encoding="utf-8") as f:
-            content = f.read().strip()
-        if not content:
-            seed_dummy_patients(30)
-        else:
-            data = json.loads(content)
-            if len(data) < settings.min_patient_records:
-                seed_dummy_patients(settings.min_patient_records)
+    # Demo data is only ever added to an empty store, and only when enabled;
+    # existing (possibly real) records are never replaced from the lookup path
+    if not settings.patient_seed_demo_data or _store.count():
+        return
+    os.makedirs(os.path.dirname(settings.patient_reports_path) or ".", exist_ok=True)
+    _store.append(dummy_patient_reports(max(30, settings.min_patient_records)))
 
 
 def seed_dummy_patients(n: int = 30) -> None:
+    # Explicitly replaces the whole store with `n` dummy patients (demos, benchmarks)
+    _store.replace_all(dummy_patient_reports(n))
+
+
+def dummy_patient_reports(n: int) -> List[PatientReport]:
     first_names = ["Alex", "Sam", "Taylor", "Jordan", "Morgan", "Riley", "Casey", "Jamie", "Avery", "Quinn"]
     last_names = ["Smith", "Johnson", "Lee", "Brown", "Davis", "Miller", "Wilson", "Moore", "Taylor", "Anderson"]
     today = datetime.utcnow()
-    records: List[Dict[str, Any]] = []
+    records: List[PatientReport] = []
     for i in range(n):
         name = f"{random.choice(first_names)} {random.choice(last_names)}"
         report = PatientReport(
@@ -86,22 +89,45 @@ def seed_dummy_patients(n: int = 30) -> None:
             warning_signs=random.sample(WARNINGS_POOL, k=random.randint(2, 3)),
             discharge_instructions=random.sample(DISCHARGE_POOL, k=random.randint(2, 3)),
         )
-        records.append(report.dict())
-
-    with open(settings.patient_reports_path, "w", encoding="utf-8") as f:
-        json.dump(records, f, ensure_ascii=False, indent=2)
+        records.append(report)
+    return records
 
 
 def load_patient_reports() -> List[PatientReport]:
     _ensure_patient_db()
-    with open(settings.patient_reports_path, "r", encoding="utf-8") as f:
-        raw = json.load(f)
-    return [PatientReport(**r) for r in raw]
+    return _store.reports()
+
+
+def patient_count() -> int:
+    _ensure_patient_db()
+    return _store.count()
+
+
+def find_patient_records(
+    name: str | None = None, discharged_from: str | None = None, discharged_to: str | None = None
+) -> List[Tuple[int, PatientReport]]:
+    # Exact normalized name and/or ISO discharge-date range; ids are for update_patient_report
+    _ensure_patient_db()
+    with timed("patient_records"):
+        return _store.find_records(name, discharged_from, discharged_to)
+
+
+def add_patient_reports(reports: List[PatientReport]) -> List[int]:
+    return _store.append(reports)
+
+
+def update_patient_report(record_id: int, report: PatientReport) -> bool:
+    return _store.update(record_id, report)
 
 
 def lookup_patient_by_name(name: str) -> List[PatientReport]:
-    name_norm = name.strip().lower()
-    reports = load_patient_reports()
-    return [r for r in reports if name_norm in r.patient_name.lower()]
+    _ensure_patient_db()
+    with timed("patient_lookup"):
+        return _store.find_substring(name)
 
 
+def search_patients_by_name(name: str, limit: int | None = None) -> List[Tuple[PatientReport, float]]:
+    _ensure_patient_db()
+    k = limit or settings.patient_lookup_limit
+    with timed("patient_fuzzy_search"):
+        return _store.search_fuzzy(name, limit=k, min_score=settings.patient_fuzzy_min_score)
@@ -0,0 +1,99 @@
+import os
+from typing import Tuple
+
+import numpy as np
+
+
+QUANTIZED_DTYPES = ("float16", "int8")
+
+
+def quantize(matrix: np.ndarray, dtype: str) -> Tuple[np.ndarray, np.ndarray | None]:
+    # int8 is symmetric per vector: row ~= q * scale with scale = max|row| / 127.
+    # float16 needs no scales.
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if dtype == "float16":
+        return matrix.astype(np.float16), None
+    if dtype == "int8":
+        scales = np.abs(matrix).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        q = np.rint(matrix / scales[:, None]).clip(-127, 127).astype(np.int8)
+        return q, scales.astype(np.float32)
+    raise ValueError(f"Unsupported quantization dtype '{dtype}'")
+
+
+def dequantize(matrix: np.ndarray, scales: np.ndarray | None) -> np.ndarray:
+    out = np.asarray(matrix, dtype=np.float32)
+    return out * scales[:, None] if scales is not None else out
+
+
+def quantized_paths(index_dir: str, dtype: str) -> Tuple[str, str]:
+    # Quantized copies sit next to the float32 embeddings.npy they were made from
+    return (
+        os.path.join(index_dir, f"embeddings.{dtype}.npy"),
+        os.path.join(index_dir, f"embeddings.{dtype}.scales.npy"),
+    )
+
+
+def save_quantized(index_dir: str, matrix: np.ndarray, dtype: str, block_rows: int = 65536) -> Tuple[str, int]:
+    # Written block by block into a memory-mapped .npy, so a memory-mapped input
+    # is never loaded whole
+    # Both files go through temp names; scales are swapped in before the matrix,
+    # whose change is what makes a running retriever reload
+    path, scales_path = quantized_paths(index_dir, dtype)
+    out = np.lib.format.open_memmap(f"{path}.tmp", mode="w+", dtype=np.dtype(dtype), shape=matrix.shape)
+    scales = np.empty(matrix.shape[0], dtype=np.float32) if dtype == "int8" else None
+    for start in range(0, matrix.shape[0], block_rows):
+        q, block_scales = quantize(matrix[start : start + block_rows], dtype)
+        out[start : start + block_rows] = q
+        if scales is not None:
+            scales[start : start + block_rows] = block_scales
+    out.flush()
+    nbytes = out.nbytes
+    del out
+    if scales is not None:
+        with open(f"{scales_path}.tmp", "wb") as f:
+            np.save(f, scales)
+        os.replace(f"{scales_path}.tmp", scales_path)
+        nbytes += scales.nbytes
+    elif os.path.exists(scales_path):
+        os.remove(scales_path)
+    os.replace(f"{path}.tmp", path)
+    return path, nbytes
+
+
+def load_quantized(index_dir: str, dtype: str) -> Tuple[np.ndarray, np.ndarray | None]:
+    path, scales_path = quantized_paths(index_dir, dtype)
+    matrix = np.load(path, mmap_mode="r")
+    scales = np.load(scales_path) if os.path.exists(scales_path) else None
+    return matrix, scales
+
+
+def row_norms(matrix: np.ndarray, block_rows: int = 65536) -> np.ndarray:
+    # Norms of the stored rows (for int8 the scale cancels out of the cosine)
+    norms = np.empty(matrix.shape[0], dtype=np.float32)
+    for start in range(0, matrix.shape[0], block_rows):
+        block = np.asarray(matrix[start : start + block_rows], dtype=np.float32)
+        norms[start : start + block_rows] = np.linalg.norm(block, axis=1)
+    norms[norms == 0] = 1.0
+    return norms
+
+
+def cosine_scores(matrix: np.ndarray, norms: np.ndarray, queries: np.ndarray, block_rows: int = 65536) -> np.ndarray:
+    # Scores every row against unit-normalized queries; rows are upcast one block
+    # at a time so a quantized matrix is never materialized as float32 in full.
+    scores = np.empty((matrix.shape[0], queries.shape[0]), dtype=np.float32)
+    qt = queries.T.astype(np.float32)
+    for start in range(0, matrix.shape[0], block_rows):
+        block = np.asarray(matrix[start : start + block_rows], dtype=np.float32)
+        scores[start : start + block_rows] = block @ qt
+    scores /= norms[:, None]
+    return scores
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    n = scores.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k] if k < n else np.arange(n)
+    return top[np.argsort(-scores[top], kind="stable")]
@@ -0,0 +1,77 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Tuple
+
+
+BatchHandler = Callable[[List[str], int], List[List[Dict[str, Any]]]]
+
+
+class QueryBatcher:
+    # Coalesces concurrent retrievals: queries arriving within `max_wait` seconds of
+    # the first one (up to `max_batch`) are handed to `handler` together (one call
+    # per distinct top_k), which embeds them in one forward pass and issues one
+    # multi-query to the index.
+    def __init__(self, handler: BatchHandler, max_batch: int, max_wait: float) -> None:
+        self.handler = handler
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self._queue: "queue.Queue[Tuple[str, int, Future]]" = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"queries": 0, "batches": 0, "max_batch_seen": 0}
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="rag-query-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, query: str, top_k: int) -> "Future[List[Dict[str, Any]]]":
+        self._ensure_started()
+        fut: "Future[List[Dict[str, Any]]]" = Future()
+        self._queue.put((query, top_k, fut))
+        return fut
+
+    def _collect(self) -> List[Tuple[str, int, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            batch = [b for b in batch if b[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            # One handler call per distinct top_k: k also sizes the hybrid candidate
+            # lists fed into fusion, so asking for the batch maximum and trimming
+            # would make a caller's ranking depend on who shared its batch
+            by_k: Dict[int, List[Tuple[str, Future]]] = {}
+            for q, top_k, fut in batch:
+                by_k.setdefault(top_k, []).append((q, fut))
+            for k, group in by_k.items():
+                queries = list(dict.fromkeys(q for q, _ in group))
+                try:
+                    results = dict(zip(queries, self.handler(queries, k)))
+                except Exception as e:
+                    for _, fut in group:
+                        fut.set_exception(e)
+                    continue
+                for q, fut in group:
+                    fut.set_result([dict(r) for r in results[q]])
+            self.stats["queries"] += len(batch)
+            self.stats["batches"] += 1
+            self.stats["max_batch_seen"] = max(self.stats["max_batch_seen"], len(batch))
+
+    def snapshot(self) -> Dict[str, int]:
+        return {**self.stats, "queued": self._queue.qsize()}
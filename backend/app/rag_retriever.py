@@ -1,15 +1,22 @@
-from typing import List, Dict, Any
+from typing import Any, Callable, Dict, List, Tuple
 import os
-import json
-
-import chromadb
-from chromadb.utils import embedding_functions
+import threading
 
+from .chunk_io import iter_chunks
 from .config import settings
+from .executors import run_inference
+from .index_sync import max_batch_size, sync_collection
+from .logging_utils import log_error
+from .retriever_base import BaseRetriever
 
 
-class RAGRetriever:
+class RAGRetriever(BaseRetriever):
     def __init__(self) -> None:
+        super().__init__()
+        # Imported here so the numpy backend can run without Chroma installed
+        import chromadb
+        from chromadb.utils import embedding_functions
+
         os.makedirs(settings.vector_store_dir, exist_ok=True)
         self.client = chromadb.PersistentClient(path=settings.vector_store_dir)
         self.embedding_fn = embedding_functions.SentenceTransformerEmbeddingFunction(
@@ -19,38 +26,147 @@ class RAGRetriever:
             name="nephrology_ref",
             embedding_function=self.embedding_fn,
         )
+        self.sync_stats: Dict[str, Any] | None = None
         self._ensure_index_built()
+        self.invalidate_cache()
 
     def _ensure_index_built(self) -> None:
-        # If empty, try to load chunks.json and populate
-        if self.collection.count() == 0 and os.path.exists(settings.pdf_chunks_path):
-            with open(settings.pdf_chunks_path, "r", encoding="utf-8") as f:
-                chunks: List[Dict[str, Any]] = json.load(f)
-            ids = []
-            texts = []
-            metadatas = []
-            for i, ch in enumerate(chunks):
-                ids.append(f"chunk-{i}")
-                texts.append(ch.get("text", ""))
-                meta = {k: v for k, v in ch.items() if k != "text"}
-                metadatas.append(meta)
-            if texts:
-                self.collection.add(ids=ids, documents=texts, metadatas=metadatas)
-
-    def retrieve(self, query: str, top_k: int | None = None) -> List[Dict[str, Any]]:
-        k = top_k or settings.num_retrieval_results
-        results = self.collection.query(query_texts=[query], n_results=k)
-        retrieved: List[Dict[str, Any]] = []
-        # Results structure: ids, documents, metadatas, distances
-        for idx in range(len(results.get("ids", [[]])[0])):
-            retrieved.append(
-                {
-                    "id": results["ids"][0][idx],
-                    "text": results["documents"][0][idx],
-                    "metadata": results["metadatas"][0][idx],
-                    "distance": results.get("distances", [[None]])[0][idx],
-                }
+        # Sync the collection with chunks.json: only new/changed chunks are embedded,
+        # removed ones are deleted (see index_sync)
+        if not os.path.exists(settings.pdf_chunks_path):
+            return
+        try:
+            self.sync_stats = sync_collection(
+                self.collection,
+                iter_chunks(settings.pdf_chunks_path),
+                settings.rag_index_manifest_path,
+                model=settings.embedding_model_name,
+                store=os.path.abspath(settings.vector_store_dir),
+                embed=lambda ids, chunks: self.embedding_fn([ch.get("text", "") for ch in chunks]),
+                batch_size=max_batch_size(self.client, settings.rag_index_batch_size),
             )
-        return retrieved
+        except Exception as e:
+            # Serve whatever is already indexed rather than failing startup
+            log_error("RAG index sync failed", {"error": str(e)})
+
+    def _index_version(self) -> Tuple[int, int]:
+        # The manifest is rewritten on every sync, so in-place updates that keep
+        # the count unchanged still invalidate cached results
+        try:
+            manifest_mtime = os.stat(settings.rag_index_manifest_path).st_mtime_ns
+        except OSError:
+            manifest_mtime = 0
+        return (self.collection.count(), manifest_mtime)
+
+    def _embed(self, texts: List[str]) -> List[Any]:
+        return self.embedding_fn(texts)
+
+    def _search(self, embeddings: List[Any], k: int) -> List[List[Dict[str, Any]]]:
+        results = self.collection.query(query_embeddings=embeddings, n_results=k)
+        # Results structure: ids, documents, metadatas, distances (one list per query)
+        distances = results.get("distances") or [[None] * len(ids) for ids in results["ids"]]
+        out: List[List[Dict[str, Any]]] = []
+        for row in range(len(results["ids"])):
+            retrieved: List[Dict[str, Any]] = []
+            for idx in range(len(results["ids"][row])):
+                retrieved.append(
+                    {
+                        "id": results["ids"][row][idx],
+                        "text": results["documents"][row][idx],
+                        "metadata": results["metadatas"][row][idx],
+                        "distance": distances[row][idx],
+                    }
+                )
+            out.append(retrieved)
+        return out
+
+
+def build_retriever(embed_fn: Callable[[List[str]], List[Any]] | None = None) -> BaseRetriever:
+    backend = settings.rag_backend.lower()
+    if backend == "numpy":
+        from .numpy_retriever import NumpyRetriever
+
+        return NumpyRetriever(
+            settings.numpy_index_dir,
+            settings.pdf_chunks_path,
+            dtype=settings.numpy_index_dtype,
+            rerank_candidates=settings.numpy_rerank_candidates,
+            embed_fn=embed_fn,
+        )
+    if backend == "chroma":
+        if embed_fn is not None:
+            # The collection embeds documents with its own model; queries must match it
+            raise ValueError("A custom embed_fn is only supported by RAG_BACKEND=numpy")
+        return RAGRetriever()
+    raise ValueError(f"Unknown RAG_BACKEND '{settings.rag_backend}'")
+
+
+_retriever: BaseRetriever | None = None
+_retriever_lock = threading.Lock()
+_warmup_thread: threading.Thread | None = None
+_warmup_error: str | None = None
+
+
+def get_retriever() -> BaseRetriever:
+    # One retriever (model + index) per process, built on first use
+    global _retriever
+    if _retriever is None:
+        with _retriever_lock:
+            if _retriever is None:
+                _retriever = build_retriever()
+    return _retriever
+
+
+def set_retriever(retriever: BaseRetriever) -> None:
+    # Installs a retriever built elsewhere (e.g. with a custom embed_fn) as the process-wide one
+    global _retriever
+    with _retriever_lock:
+        _retriever = retriever
+
+
+def retrieve(query: str, top_k: int | None = None) -> List[Dict[str, Any]]:
+    return get_retriever().retrieve(query, top_k=top_k)
+
+
+async def aretrieve(query: str, top_k: int | None = None) -> List[Dict[str, Any]]:
+    # The first call builds the retriever (model load) off the event loop
+    retriever = _retriever if _retriever is not None else await run_inference(get_retriever)
+    return await retriever.aretrieve(query, top_k=top_k)
+
+
+def warm_up() -> None:
+    global _warmup_error
+    try:
+        get_retriever().warm_up()
+    except Exception as e:
+        # Requests still build the retriever lazily; surface the failure on /health
+        _warmup_error = str(e)
+        log_error("RAG warm-up failed", {"error": str(e)})
+
+
+def start_background_warmup() -> threading.Thread:
+    global _warmup_thread
+    with _retriever_lock:
+        if _warmup_thread is None:
+            _warmup_thread = threading.Thread(target=warm_up, name="rag-warmup", daemon=True)
+            _warmup_thread.start()
+    return _warmup_thread
 
 
+def retriever_status() -> Dict[str, Any]:
+    warming = _warmup_thread is not None and _warmup_thread.is_alive()
+    # Ready only once an embedding has succeeded (warm-up or a real query), i.e. the
+    # model is loaded; "loaded" just means the retriever object and index exist
+    ready = _retriever is not None and _retriever.embedder_ready
+    status: Dict[str, Any] = {
+        "ready": ready,
+        "loaded": _retriever is not None,
+        "warming": warming,
+        "error": None if ready else _warmup_error,
+    }
+    if _retriever is not None:
+        status["cache"] = _retriever.cache_stats()
+        status["batching"] = _retriever.batcher_stats()
+        status["hybrid"] = _retriever.hybrid_stats()
+        status["index_sync"] = getattr(_retriever, "sync_stats", None)
+    return status
@@ -0,0 +1,211 @@
+import asyncio
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Dict, Hashable, List
+
+from .bm25 import LexicalIndex, reciprocal_rank_fusion
+from .cache import TTLCache
+from .config import settings
+from .executors import run_inference
+from .metrics import timed
+from .query_batcher import QueryBatcher
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class BaseRetriever(ABC):
+    # Backend-independent retrieval: embedding/result caches, cache invalidation on
+    # index changes, micro-batching and optional BM25 hybrid fusion. Backends
+    # implement _embed, _search and _index_version.
+    def __init__(self) -> None:
+        self._embedding_cache = TTLCache(settings.rag_cache_size, settings.rag_cache_ttl_seconds)
+        self._result_cache = TTLCache(settings.rag_cache_size, settings.rag_cache_ttl_seconds)
+        self._version_lock = threading.Lock()
+        self._version: Hashable = None
+        self._version_checked = 0.0
+        # Set by the first successful embedding call: backends load their model lazily,
+        # so a constructed retriever isn't yet ready to serve without a cold start
+        self.embedder_ready = False
+        self._lexical: LexicalIndex | None = None
+        if settings.rag_hybrid_enabled:
+            self._lexical = LexicalIndex(settings.pdf_chunks_path, settings.rag_bm25_k1, settings.rag_bm25_b)
+        self._stats_lock = threading.Lock()
+        self.hybrid_counts: Dict[str, int] = {"fused": 0, "lexical_only": 0}
+        self._batcher: QueryBatcher | None = None
+        if settings.rag_batching_enabled:
+            self._batcher = QueryBatcher(
+                self.retrieve_many,
+                max_batch=settings.rag_batch_max_size,
+                max_wait=settings.rag_batch_max_wait_ms / 1000.0,
+            )
+
+    @abstractmethod
+    def _embed(self, texts: List[str]) -> List[Any]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def _search(self, embeddings: List[Any], k: int) -> List[List[Dict[str, Any]]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def _index_version(self) -> Hashable:
+        raise NotImplementedError
+
+    def warm_up(self) -> None:
+        # A dummy forward pass so the first real query doesn't pay for lazy model init
+        self._embed(["warm up"])
+        self.embedder_ready = True
+
+    def _current_version(self) -> Hashable:
+        lexical = self._lexical.signature() if self._lexical is not None else None
+        return (self._index_version(), lexical)
+
+    def invalidate_cache(self) -> None:
+        with self._version_lock:
+            self._version = self._current_version()
+            self._version_checked = time.monotonic()
+        self._result_cache.clear()
+
+    def _collection_version(self) -> Hashable:
+        # Re-check the index at most every few seconds; a change means it was
+        # rebuilt elsewhere and cached results are stale
+        now = time.monotonic()
+        if now - self._version_checked >= settings.rag_cache_version_check_seconds:
+            with self._version_lock:
+                if now - self._version_checked >= settings.rag_cache_version_check_seconds:
+                    version = self._current_version()
+                    self._version_checked = now
+                    if version != self._version:
+                        self._version = version
+                        self._result_cache.clear()
+        return self._version
+
+    def embed_queries(self, queries: List[str]) -> List[Any]:
+        # Normalized text is only the cache key; the model sees the query as written
+        # (casing carries meaning for drug names and abbreviations)
+        norms = [normalize_query(q) for q in queries]
+        embs: List[Any] = [self._embedding_cache.get(n) for n in norms]
+        missing: Dict[str, str] = {}
+        for n, q, e in zip(norms, queries, embs):
+            if e is None:
+                missing.setdefault(n, q)
+        if missing:
+            # One batched forward pass for every query not already cached
+            with timed("embedding"):
+                fresh = dict(zip(missing, self._embed(list(missing.values()))))
+            self.embedder_ready = True
+            for n, e in fresh.items():
+                self._embedding_cache.set(n, e)
+            embs = [e if e is not None else fresh[n] for n, e in zip(norms, embs)]
+        return embs
+
+    def embed_query(self, query: str) -> Any:
+        return self.embed_queries([query])[0]
+
+    def retrieve_many(self, queries: List[str], top_k: int | None = None) -> List[List[Dict[str, Any]]]:
+        k = top_k or settings.num_retrieval_results
+        version = self._collection_version()
+        keys = [(normalize_query(q), k, version) for q in queries]
+        out: List[List[Dict[str, Any]] | None] = [self._result_cache.get(key) for key in keys]
+        pending = [i for i, r in enumerate(out) if r is None]
+        if pending:
+            batch = [queries[i] for i in pending]
+            fresh = self._dense_many(batch, k) if self._lexical is None else self._hybrid_many(batch, k)
+            for i, retrieved in zip(pending, fresh):
+                self._result_cache.set(keys[i], retrieved)
+                out[i] = retrieved
+        return [[dict(r) for r in res] for res in out]
+
+    def _dense_many(self, queries: List[str], k: int) -> List[List[Dict[str, Any]]]:
+        embs = self.embed_queries(queries)
+        with timed("vector_query"):
+            return self._search(embs, k)
+
+    def _hybrid_many(self, queries: List[str], k: int) -> List[List[Dict[str, Any]]]:
+        # BM25 catches exact drug names and lab terms the embedding blurs. When the
+        # top lexical hit is decisive the query is answered without an embedding
+        # call; otherwise dense and lexical rankings are fused with RRF.
+        bm25 = self._lexical.index()
+        with timed("lexical_query"):
+            hits = [bm25.search(q, max(k, settings.rag_hybrid_lexical_top_k)) for q in queries]
+        # With RAG_MAX_DISTANCE set the answer gate needs a dense distance, so the
+        # lexical-only shortcut is off
+        skip_ratio = settings.rag_lexical_skip_ratio if settings.rag_max_distance is None else 0
+        need_dense = [
+            i
+            for i, (q, h) in enumerate(zip(queries, hits))
+            if not bm25.is_decisive(q, h, skip_ratio, settings.rag_lexical_skip_min_score)
+        ]
+        dense: Dict[int, List[Dict[str, Any]]] = {}
+        if need_dense:
+            dense_k = settings.rag_hybrid_dense_top_k or k
+            dense = dict(zip(need_dense, self._dense_many([queries[i] for i in need_dense], dense_k)))
+        out: List[List[Dict[str, Any]]] = []
+        for i, h in enumerate(hits):
+            lexical = [bm25.result(row, score) for row, score in h]
+            if i in dense:
+                out.append(reciprocal_rank_fusion([dense[i], lexical], k, settings.rag_rrf_k))
+            else:
+                out.append(lexical[:k])
+        with self._stats_lock:
+            self.hybrid_counts["fused"] += len(dense)
+            self.hybrid_counts["lexical_only"] += len(hits) - len(dense)
+        return out
+
+    def retrieve(self, query: str, top_k: int | None = None) -> List[Dict[str, Any]]:
+        # Includes cache hits and time spent waiting for a micro-batch
+        with timed("retrieval"):
+            return self._retrieve(query, top_k)
+
+    def _retrieve(self, query: str, top_k: int | None) -> List[Dict[str, Any]]:
+        k = top_k or settings.num_retrieval_results
+        key = (normalize_query(query), k, self._collection_version())
+        cached = self._result_cache.get(key)
+        if cached is not None:
+            return [dict(r) for r in cached]
+        if self._batcher is None:
+            return self.retrieve_many([query], k)[0]
+        fut = self._batcher.submit(query, k)
+        try:
+            retrieved = fut.result(timeout=settings.rag_batch_timeout_ms / 1000.0)
+        except FutureTimeout:
+            fut.cancel()
+            raise
+        self._result_cache.set(key, retrieved)
+        return [dict(r) for r in retrieved]
+
+    async def aretrieve(self, query: str, top_k: int | None = None) -> List[Dict[str, Any]]:
+        # Event-loop entry point. With batching on, the batcher's future is awaited
+        # directly instead of parking an inference thread on it; the batch handler
+        # checks the result cache itself.
+        if self._batcher is None:
+            return await run_inference(self.retrieve, query, top_k)
+        k = top_k or settings.num_retrieval_results
+        # Cache hits are answered on the loop against the last known index version,
+        # since probing it may block. Once a re-check is due the query goes through
+        # the batch handler, which probes, so an all-hits workload still notices a
+        # rebuilt index.
+        fresh_version = time.monotonic() - self._version_checked < settings.rag_cache_version_check_seconds
+        cached = self._result_cache.get((normalize_query(query), k, self._version)) if fresh_version else None
+        if cached is not None:
+            with timed("retrieval"):
+                return [dict(r) for r in cached]
+        fut = self._batcher.submit(query, k)
+        with timed("retrieval"):
+            return await asyncio.wait_for(asyncio.wrap_future(fut), timeout=settings.rag_batch_timeout_ms / 1000.0)
+
+    def cache_stats(self) -> Dict[str, Dict[str, int]]:
+        return {"embeddings": self._embedding_cache.stats(), "results": self._result_cache.stats()}
+
+    def hybrid_stats(self) -> Dict[str, int] | None:
+        if self._lexical is None:
+            return None
+        with self._stats_lock:
+            return dict(self.hybrid_counts)
+
+    def batcher_stats(self) -> Dict[str, int] | None:
+        return self._batcher.snapshot() if self._batcher is not None else None
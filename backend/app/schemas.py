@@ -17,6 +17,7 @@ class PatientReport(BaseModel):
 class PatientLookupResponse(BaseModel):
     status: str
     matches: List[PatientReport] = Field(default_factory=list)
+    scores: List[float] = Field(default_factory=list)
     message: Optional[str] = None
 
 
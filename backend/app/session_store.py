@@ -0,0 +1,185 @@
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+from .config import settings
+from .schemas import ChatSessionState
+
+
+def trim_history(state: ChatSessionState, max_turns: int) -> None:
+    if max_turns > 0 and len(state.history) > max_turns:
+        del state.history[: len(state.history) - max_turns]
+
+
+class SessionStore(ABC):
+    def __init__(self, ttl_seconds: float, max_sessions: int, max_history: int) -> None:
+        self.ttl = ttl_seconds
+        self.max_sessions = max_sessions
+        self.max_history = max_history
+        self._stats_lock = threading.Lock()
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0}
+
+    def _count(self, key: str, n: int = 1) -> None:
+        if n:
+            with self._stats_lock:
+                self.stats[key] += n
+
+    @abstractmethod
+    def get(self, session_id: str) -> ChatSessionState | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def save(self, state: ChatSessionState) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def live_sessions(self) -> int:
+        raise NotImplementedError
+
+    def snapshot(self) -> Dict[str, int]:
+        return {**self.stats, "live": self.live_sessions()}
+
+
+class MemorySessionStore(SessionStore):
+    # Per-process store: OrderedDict in LRU order, entries expire `ttl` seconds after last access.
+    def __init__(self, ttl_seconds: float, max_sessions: int, max_history: int) -> None:
+        super().__init__(ttl_seconds, max_sessions, max_history)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, ChatSessionState]]" = OrderedDict()
+
+    def _purge_expired(self, now: float) -> None:
+        # Oldest-accessed entries sit at the front, so stop at the first live one
+        expired = 0
+        while self._entries:
+            sid, (last, _) = next(iter(self._entries.items()))
+            if now - last < self.ttl:
+                break
+            self._entries.popitem(last=False)
+            expired += 1
+        self._count("expired", expired)
+
+    def get(self, session_id: str) -> ChatSessionState | None:
+        now = time.monotonic()
+        with self._lock:
+            self._purge_expired(now)
+            entry = self._entries.get(session_id)
+            if entry is None:
+                self._count("misses")
+                return None
+            self._entries[session_id] = (now, entry[1])
+            self._entries.move_to_end(session_id)
+        self._count("hits")
+        return entry[1]
+
+    def save(self, state: ChatSessionState) -> None:
+        trim_history(state, self.max_history)
+        now = time.monotonic()
+        with self._lock:
+            self._entries[state.session_id] = (now, state)
+            self._entries.move_to_end(state.session_id)
+            self._purge_expired(now)
+            evicted = 0
+            while self.max_sessions and len(self._entries) > self.max_sessions:
+                self._entries.popitem(last=False)
+                evicted += 1
+        self._count("evicted", evicted)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def live_sessions(self) -> int:
+        with self._lock:
+            self._purge_expired(time.monotonic())
+            return len(self._entries)
+
+
+class SQLiteSessionStore(SessionStore):
+    # Shared store so several uvicorn workers can serve the same session. Each
+    # thread keeps its own connection; WAL mode lets readers run alongside a writer.
+    def __init__(self, path: str, ttl_seconds: float, max_sessions: int, max_history: int) -> None:
+        super().__init__(ttl_seconds, max_sessions, max_history)
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, state TEXT NOT NULL, last_access REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_last_access ON sessions(last_access)")
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, session_id: str) -> ChatSessionState | None:
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT state FROM sessions WHERE session_id = ? AND last_access > ?",
+            (session_id, now - self.ttl),
+        ).fetchone()
+        if row is None:
+            self._count("misses")
+            return None
+        conn.execute("UPDATE sessions SET last_access = ? WHERE session_id = ?", (now, session_id))
+        conn.commit()
+        self._count("hits")
+        return ChatSessionState.model_validate_json(row[0])
+
+    def save(self, state: ChatSessionState) -> None:
+        trim_history(state, self.max_history)
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT INTO sessions (session_id, state, last_access) VALUES (?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET state = excluded.state, last_access = excluded.last_access",
+                (state.session_id, state.model_dump_json(), now),
+            )
+            expired = conn.execute("DELETE FROM sessions WHERE last_access <= ?", (now - self.ttl,)).rowcount
+            evicted = 0
+            if self.max_sessions:
+                evicted = conn.execute(
+                    "DELETE FROM sessions WHERE session_id IN ("
+                    "SELECT session_id FROM sessions ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                    (self.max_sessions,),
+                ).rowcount
+        self._count("expired", max(expired, 0))
+        self._count("evicted", max(evicted, 0))
+
+    def delete(self, session_id: str) -> None:
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def live_sessions(self) -> int:
+        row = self._conn().execute(
+            "SELECT COUNT(*) FROM sessions WHERE last_access > ?", (time.time() - self.ttl,)
+        ).fetchone()
+        return int(row[0])
+
+
+def build_session_store() -> SessionStore:
+    backend = settings.session_backend.lower()
+    args = (settings.session_ttl_seconds, settings.session_max_entries, settings.session_max_history)
+    if backend == "sqlite":
+        return SQLiteSessionStore(settings.session_db_path, *args)
+    if backend == "memory":
+        return MemorySessionStore(*args)
+    raise ValueError(f"Unknown SESSION_BACKEND '{settings.session_backend}'")
@@ -1,22 +1,225 @@
-from typing import List
-from duckduckgo_search import DDGS
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List
 
+from .cache import TTLCache
 from .config import settings
+from .logging_utils import log_error
+from .metrics import timed
 from .schemas import WebSearchResult
 
 
+def normalize_search_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class SearchProvider(ABC):
+    name = "base"
+
+    @abstractmethod
+    def search(self, query: str, max_results: int) -> List[WebSearchResult]:
+        raise NotImplementedError
+
+
+class DDGSProvider(SearchProvider):
+    # Keeps one DDGS client per thread so its HTTP connection pool and TLS sessions
+    # are reused across searches instead of being rebuilt on every call.
+    name = "ddgs"
+
+    def __init__(self, timeout: float) -> None:
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _client(self) -> Any:
+        client = getattr(self._local, "client", None)
+        if client is None:
+            from duckduckgo_search import DDGS
+
+            client = DDGS(timeout=self.timeout)
+            self._local.client = client
+        return client
+
+    def search(self, query: str, max_results: int) -> List[WebSearchResult]:
+        try:
+            rows = self._client().text(query, max_results=max_results)
+        except Exception:
+            # Drop the client so a broken connection isn't reused
+            self._local.client = None
+            raise
+        return [
+            WebSearchResult(title=r.get("title", ""), url=r.get("href", ""), snippet=r.get("body", ""))
+            for r in rows or []
+        ]
+
+
+class FixtureSearchProvider(SearchProvider):
+    # Offline stand-in for tests and benchmarks: ranks entries of a local JSON file
+    # ([{title, url, snippet}, ...]) by how many query terms they contain.
+    name = "fixture"
+
+    def __init__(self, path: str) -> None:
+        with open(path, "r", encoding="utf-8") as f:
+            self.entries = [WebSearchResult(**e) for e in json.load(f)]
+        self._terms = [set(normalize_search_query(f"{e.title} {e.snippet or ''}").split()) for e in self.entries]
+
+    def search(self, query: str, max_results: int) -> List[WebSearchResult]:
+        q = set(normalize_search_query(query).split())
+        scored = [(len(q & terms), i) for i, terms in enumerate(self._terms)]
+        ranked = sorted((s for s in scored if s[0] > 0), key=lambda s: (-s[0], s[1]))
+        return [self.entries[i] for _, i in ranked[:max_results]]
+
+
+class SearchResultCache:
+    # On-disk TTL cache shared by workers; rows older than `ttl` are treated as stale.
+    def __init__(self, path: str, ttl_seconds: float) -> None:
+        self.path = path
+        self.ttl = ttl_seconds
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS web_results (key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)")
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str, allow_stale: bool = False) -> List[WebSearchResult] | None:
+        row = self._conn().execute("SELECT value, created FROM web_results WHERE key = ?", (key,)).fetchone()
+        if row is None or (not allow_stale and time.time() - row[1] >= self.ttl):
+            return None
+        return [WebSearchResult(**r) for r in json.loads(row[0])]
+
+    def set(self, key: str, results: List[WebSearchResult]) -> None:
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO web_results (key, value, created) VALUES (?, ?, ?)",
+                (key, json.dumps([r.model_dump() for r in results]), time.time()),
+            )
+
+
+class CircuitBreaker:
+    # Opens after `failure_threshold` consecutive failures; after `reset_timeout`
+    # seconds a single trial call is let through (half-open) to probe recovery.
+    def __init__(self, failure_threshold: int, reset_timeout: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial_in_flight = False
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+
+def build_search_provider() -> SearchProvider:
+    kind = settings.web_search_provider.lower()
+    if kind == "fixture":
+        return FixtureSearchProvider(settings.web_search_fixture_path)
+    if kind == "ddgs":
+        return DDGSProvider(timeout=settings.web_search_timeout_seconds)
+    raise ValueError(f"Unknown WEB_SEARCH_PROVIDER '{settings.web_search_provider}'")
+
+
+_provider: SearchProvider | None = None
+_disk_cache: SearchResultCache | None = None
+_memory_cache = TTLCache(settings.web_search_memory_cache_size, settings.web_search_cache_ttl_seconds)
+_breaker = CircuitBreaker(settings.web_search_breaker_failures, settings.web_search_breaker_reset_seconds)
+_init_lock = threading.Lock()
+_stats: Dict[str, int] = {"provider_calls": 0, "provider_errors": 0, "disk_hits": 0, "short_circuited": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(key: str) -> None:
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def _components() -> tuple:
+    global _provider, _disk_cache
+    if _provider is None:
+        with _init_lock:
+            if _provider is None:
+                if settings.web_search_cache_path:
+                    _disk_cache = SearchResultCache(settings.web_search_cache_path, settings.web_search_cache_ttl_seconds)
+                _provider = build_search_provider()
+    return _provider, _disk_cache
+
+
 def web_search(query: str, max_results: int | None = None) -> List[WebSearchResult]:
+    with timed("web_search"):
+        return _web_search(query, max_results)
+
+
+def _web_search(query: str, max_results: int | None) -> List[WebSearchResult]:
     k = max_results or settings.web_search_results
-    results: List[WebSearchResult] = []
-    with DDGS() as ddgs:
-        for r in ddgs.text(query, max_results=k):
-            results.append(
-                WebSearchResult(
-                    title=r.get("title", ""),
-                    url=r.get("href", ""),
-                    snippet=r.get("body", ""),
-                )
-            )
-    return results
+    provider, disk_cache = _components()
+    key = f"{provider.name}:{k}:{normalize_search_query(query)}"
+    cached = _memory_cache.get(key)
+    if cached is not None:
+        return list(cached)
+    if disk_cache is not None:
+        cached = disk_cache.get(key)
+        if cached is not None:
+            _count("disk_hits")
+            _memory_cache.set(key, cached)
+            return list(cached)
+
+    if not _breaker.allow():
+        _count("short_circuited")
+        stale = disk_cache.get(key, allow_stale=True) if disk_cache is not None else None
+        return list(stale or [])
+    try:
+        _count("provider_calls")
+        with timed("web_search_provider"):
+            results = provider.search(query, k)
+    except Exception as e:
+        _count("provider_errors")
+        _breaker.record_failure()
+        log_error("web_search provider failed", {"provider": provider.name, "error": str(e)})
+        stale = disk_cache.get(key, allow_stale=True) if disk_cache is not None else None
+        return list(stale or [])
+    _breaker.record_success()
+    _memory_cache.set(key, results)
+    if disk_cache is not None:
+        disk_cache.set(key, results)
+    return list(results)
 
 
+def web_search_stats() -> Dict[str, Any]:
+    return {**_stats, "breaker": _breaker.state, "memory_cache": _memory_cache.stats()}
@@ -0,0 +1,369 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List
+
+import numpy as np
+
+
+BACKEND_DIR = Path(__file__).resolve().parent
+
+VOCAB = (
+    "kidney renal dialysis creatinine egfr potassium phosphorus sodium fluid swelling edema blood pressure "
+    "hypertension diabetes diet protein urine proteinuria anemia erythropoietin transplant rejection "
+    "medication dose tacrolimus furosemide lisinopril calcium vitamin bone acidosis bicarbonate nephrotic "
+    "glomerular filtration stage chronic acute injury infection pain fatigue nausea shortness breath "
+    "follow-up clinic labs monitoring albumin cholesterol statin heart failure catheter fistula access"
+).split()
+FILLER = "the patient should be with and of in to for a is are may can when if or as".split()
+SECTIONS = ["CHRONIC KIDNEY DISEASE", "ACUTE KIDNEY INJURY", "DIALYSIS", "TRANSPLANTATION", "Treatment:", "Diagnosis:"]
+# Words the receptionist routes to the clinical agent (see receptionist_handle)
+CLINICAL_KEYWORDS = ["pain", "swelling", "medication", "dose", "kidney", "urine", "diet", "potassium", "phosphorus"]
+EMBED_DIM = 384
+
+
+def synthetic_chunks(n: int, rng: random.Random) -> List[Dict[str, Any]]:
+    chunks = []
+    for i in range(n):
+        words = [rng.choice(VOCAB) if rng.random() < 0.45 else rng.choice(FILLER) for _ in range(rng.randint(300, 420))]
+        chunks.append({"id": f"chunk_{i}", "text": " ".join(words) + ".", "page": 1 + i // 3, "section": rng.choice(SECTIONS)})
+    return chunks
+
+
+def synthetic_queries(n: int, rng: random.Random) -> List[str]:
+    return [
+        f"{rng.choice(CLINICAL_KEYWORDS)} {' '.join(rng.sample(VOCAB, rng.randint(2, 5)))}"
+        for _ in range(n)
+    ]
+
+
+def hash_embed(texts: List[str]) -> List[np.ndarray]:
+    # Signed feature hashing of the BM25 tokens: deterministic, model-free and
+    # cheap, so the harness measures the service rather than a transformer
+    from app.bm25 import tokenize
+
+    out = []
+    for text in texts:
+        vec = np.zeros(EMBED_DIM, dtype=np.float32)
+        for token in tokenize(text):
+            h = zlib.crc32(token.encode("utf-8"))
+            vec[h % EMBED_DIM] += 1.0 if (h >> 16) & 1 else -1.0
+        vec /= max(float(np.linalg.norm(vec)), 1e-12)
+        out.append(vec)
+    return out
+
+
+def model_embed(texts: List[str]) -> List[np.ndarray]:
+    from sentence_transformers import SentenceTransformer
+    from app.config import settings
+
+    model = SentenceTransformer(settings.embedding_model_name)
+    return list(model.encode(texts, convert_to_numpy=True, normalize_embeddings=True, batch_size=64))
+
+
+def configure_environment(work_dir: Path, patient_store: str) -> None:
+    # Must run before `app` is imported: settings are read from the environment once.
+    # Data paths always point into the work dir; tunables can be overridden by the caller.
+    forced = {
+        "PATIENT_REPORTS_PATH": work_dir / ("patients.sqlite3" if patient_store == "sqlite" else "patient_reports.json"),
+        "PDF_CHUNKS_PATH": work_dir / "chunks.jsonl",
+        "NUMPY_INDEX_DIR": work_dir / "index",
+        "AGENT_AUDIT_LOG_PATH": work_dir / "logs" / "agent_audit.json",
+        "ERROR_LOG_PATH": work_dir / "logs" / "error.log",
+        "WEB_SEARCH_CACHE_PATH": work_dir / "web_search.sqlite3",
+        "SESSION_DB_PATH": work_dir / "sessions.sqlite3",
+        "RAG_BACKEND": "numpy",
+        "RAG_WARMUP_ON_STARTUP": "false",
+        "WEB_SEARCH_PROVIDER": "fixture",
+    }
+    for key, value in forced.items():
+        os.environ[key] = str(value)
+    os.environ.setdefault("SESSION_BACKEND", "memory")
+
+
+def build_corpus(work_dir: Path, num_chunks: int, embedder: str, rng: random.Random) -> None:
+    from app.chunk_io import write_chunks
+
+    chunks = synthetic_chunks(num_chunks, rng)
+    write_chunks(str(work_dir / "chunks.jsonl"), chunks)
+    embed = hash_embed if embedder == "hash" else model_embed
+    index_dir = work_dir / "index"
+    index_dir.mkdir(parents=True, exist_ok=True)
+    np.save(index_dir / "embeddings.npy", np.stack(embed([c["text"] for c in chunks])).astype(np.float32))
+    with open(index_dir / "ids.json", "w", encoding="utf-8") as f:
+        json.dump([c["id"] for c in chunks], f)
+
+
+def peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def percentile(sorted_ms: List[float], q: float) -> float:
+    if not sorted_ms:
+        return 0.0
+    rank = min(len(sorted_ms) - 1, max(0, int(round(q * len(sorted_ms) + 0.5)) - 1))
+    return round(sorted_ms[rank], 3)
+
+
+def summarize(latencies_ms: List[float], errors: int, wall_s: float, concurrency: int) -> Dict[str, Any]:
+    ms = sorted(latencies_ms)
+    return {
+        "requests": len(ms),
+        "errors": errors,
+        "concurrency": concurrency,
+        "wall_s": round(wall_s, 3),
+        "throughput_rps": round(len(ms) / wall_s, 1) if wall_s else 0.0,
+        "mean_ms": round(sum(ms) / len(ms), 3) if ms else 0.0,
+        "p50_ms": percentile(ms, 0.50),
+        "p95_ms": percentile(ms, 0.95),
+        "p99_ms": percentile(ms, 0.99),
+        "max_ms": round(ms[-1], 3) if ms else 0.0,
+    }
+
+
+async def run_phase(jobs: List[Callable[[], Awaitable[List[Any]]]], concurrency: int) -> Dict[str, Any]:
+    # Each job returns (latency_ms, ok) per request it made (a chat job is several turns)
+    latencies: List[float] = []
+    errors = 0
+    sem = asyncio.Semaphore(concurrency)
+
+    async def run(job: Callable[[], Awaitable[List[Any]]]) -> None:
+        nonlocal errors
+        async with sem:
+            for elapsed_ms, ok in await job():
+                latencies.append(elapsed_ms)
+                errors += 0 if ok else 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run(job) for job in jobs))
+    return summarize(latencies, errors, time.perf_counter() - started, concurrency)
+
+
+async def timed_request(client: Any, method: str, url: str, **kwargs: Any) -> tuple:
+    started = time.perf_counter()
+    res = await client.request(method, url, **kwargs)
+    return (time.perf_counter() - started) * 1000.0, res.status_code == 200, res
+
+
+def lookup_jobs(client: Any, names: List[str], n: int, rng: random.Random) -> List[Callable]:
+    # Exact names, first-name substrings (multiple matches) and misspellings (fuzzy path)
+    def query() -> str:
+        name = rng.choice(names)
+        roll = rng.random()
+        if roll < 0.5:
+            return name
+        if roll < 0.8:
+            return name.split()[0]
+        i = rng.randrange(len(name))
+        return name[:i] + name[i + 1 :]
+
+    def job(q: str) -> Callable:
+        async def run() -> List[Any]:
+            elapsed, ok, _ = await timed_request(client, "GET", "/patients/lookup", params={"name": q})
+            return [(elapsed, ok)]
+
+        return run
+
+    return [job(query()) for _ in range(n)]
+
+
+def rag_jobs(client: Any, queries: List[str], n: int, rng: random.Random) -> List[Callable]:
+    def job(q: str) -> Callable:
+        async def run() -> List[Any]:
+            elapsed, ok, _ = await timed_request(client, "POST", "/rag/query", json={"query": q, "top_k": 4})
+            return [(elapsed, ok)]
+
+        return run
+
+    return [job(rng.choice(queries)) for _ in range(n)]
+
+
+def chat_jobs(client: Any, names: List[str], queries: List[str], users: int, turns: int, rng: random.Random) -> List[Callable]:
+    # One job per virtual user: identify, then `turns` clinical questions in the same session
+    def job(name: str, questions: List[str]) -> Callable:
+        async def run() -> List[Any]:
+            elapsed, ok, res = await timed_request(client, "POST", "/chat/session", json={"message": "hello", "patient_name": name})
+            timings = [(elapsed, ok)]
+            if not ok:
+                return timings
+            sid = res.json()["session_id"]
+            for q in questions:
+                elapsed, ok, _ = await timed_request(client, "POST", "/chat/session", json={"session_id": sid, "message": q})
+                timings.append((elapsed, ok))
+            return timings
+
+        return run
+
+    return [job(rng.choice(names), [rng.choice(queries) for _ in range(turns)]) for _ in range(users)]
+
+
+def git_revision() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    lines = [f"{'endpoint':<16} {'metric':<15} {'baseline':>10} {'current':>10} {'change':>8}"]
+    for endpoint, cur in current["endpoints"].items():
+        base = baseline.get("endpoints", {}).get(endpoint)
+        if not base:
+            continue
+        for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+            old, new = base.get(metric) or 0.0, cur.get(metric) or 0.0
+            change = (new - old) / old if old else 0.0
+            lines.append(f"{endpoint:<16} {metric:<15} {old:>10.2f} {new:>10.2f} {change:>+8.1%}")
+    return lines
+
+
+def worst_latency_regression(current: Dict[str, Any], baseline: Dict[str, Any]) -> float:
+    worst = 0.0
+    for endpoint, cur in current["endpoints"].items():
+        base = baseline.get("endpoints", {}).get(endpoint)
+        if base and base.get("p95_ms"):
+            worst = max(worst, (cur["p95_ms"] - base["p95_ms"]) / base["p95_ms"])
+    return worst
+
+
+async def run_benchmark(args: argparse.Namespace, rng: random.Random) -> Dict[str, Any]:
+    import httpx
+
+    from app.config import settings
+    from app.main import app
+    from app.metrics import metrics_snapshot, reset_metrics
+    from app.patient_utils import load_patient_reports, seed_dummy_patients
+    from app.rag_retriever import build_retriever, set_retriever
+
+    random.seed(args.seed)  # seed_dummy_patients draws from the global generator
+    seed_dummy_patients(args.patients)
+    names = [r.patient_name for r in load_patient_reports()]
+    counts = Counter(names)
+    unique = sorted(n for n, c in counts.items() if c == 1)
+    if not unique:
+        print("warning: no uniquely named patient; chat turns will stay with the receptionist", file=sys.stderr)
+    queries = synthetic_queries(args.distinct_queries, rng)
+
+    if args.embedder == "hash":
+        # Queries must be embedded the way build_corpus embedded the chunks
+        set_retriever(build_retriever(embed_fn=hash_embed))
+
+    results: Dict[str, Any] = {"endpoints": {}}
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60.0) as client:
+            # Untimed pass so lazy index/model loading and first-touch page faults are excluded
+            await run_phase(rag_jobs(client, queries, args.warmup, rng), args.concurrency)
+            await run_phase(lookup_jobs(client, names, args.warmup, rng), args.concurrency)
+            reset_metrics()
+
+            phases = {
+                "patients_lookup": lookup_jobs(client, names, args.requests, rng),
+                "rag_query": rag_jobs(client, queries, args.requests, rng),
+                "chat_session": chat_jobs(client, unique or names, queries, args.chat_users, args.chat_turns, rng),
+            }
+            for endpoint, jobs in phases.items():
+                if args.endpoints and endpoint not in args.endpoints:
+                    continue
+                results["endpoints"][endpoint] = await run_phase(jobs, args.concurrency)
+                print(f"{endpoint}: {json.dumps(results['endpoints'][endpoint])}")
+            results["stages"] = metrics_snapshot()["stages"]
+
+    results["settings"] = {
+        "rag_backend": settings.rag_backend,
+        "rag_hybrid_enabled": settings.rag_hybrid_enabled,
+        "rag_batching_enabled": settings.rag_batching_enabled,
+        "session_backend": settings.session_backend,
+        "clinical_web_search_mode": settings.clinical_web_search_mode,
+        "executor_inference_workers": settings.executor_inference_workers,
+    }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="In-process load test of /patients/lookup, /rag/query and /chat/session with synthetic data"
+    )
+    parser.add_argument("--patients", type=int, default=200, help="Patients seeded with seed_dummy_patients")
+    parser.add_argument("--patient_store", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--chunks", type=int, default=2000, help="Synthetic reference chunks")
+    parser.add_argument("--distinct_queries", type=int, default=200, help="Query pool size (smaller = more cache hits)")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per endpoint for lookup and RAG")
+    parser.add_argument("--chat_users", type=int, default=100, help="Chat sessions, each one identify turn plus --chat_turns")
+    parser.add_argument("--chat_turns", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--endpoints", nargs="*", choices=["patients_lookup", "rag_query", "chat_session"])
+    parser.add_argument("--embedder", choices=["hash", "model"], default="hash", help="model uses EMBEDDING_MODEL_NAME")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work_dir", default=None, help="Defaults to a temporary directory that is removed afterwards")
+    parser.add_argument("--out", default=None, help="Write results JSON here")
+    parser.add_argument("--compare", default=None, help="Baseline results JSON to diff against")
+    parser.add_argument(
+        "--max_p95_regression",
+        type=float,
+        default=0.0,
+        help="With --compare, exit 1 if any endpoint's p95 grew by more than this fraction (0 disables)",
+    )
+    args = parser.parse_args()
+
+    work_dir = Path(args.work_dir) if args.work_dir else Path(tempfile.mkdtemp(prefix="bench_api_"))
+    work_dir.mkdir(parents=True, exist_ok=True)
+    configure_environment(work_dir, args.patient_store)
+    sys.path.insert(0, str(BACKEND_DIR))
+    rng = random.Random(args.seed)
+    try:
+        build_corpus(work_dir, args.chunks, args.embedder, rng)
+        results = asyncio.run(run_benchmark(args, rng))
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    results["meta"] = {
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        # High-water mark of the whole run (build, warm-up and every phase); a
+        # per-endpoint reading would only repeat the running maximum
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    results["config"] = {k: v for k, v in vars(args).items() if k not in ("out", "compare", "work_dir")}
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved results to {args.out}")
+    print(f"peak RSS: {results['meta']['peak_rss_mb']} MB")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print("\n".join(compare(results, baseline)))
+        if args.max_p95_regression > 0 and worst_latency_regression(results, baseline) > args.max_p95_regression:
+            print(f"p95 regression above {args.max_p95_regression:.0%}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
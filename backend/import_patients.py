@@ -0,0 +1,28 @@
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from app.patient_store import SQLitePatientStore, import_json, is_sqlite_path  # noqa: E402
+
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Import patient_reports.json into a SQLite patient store")
+    parser.add_argument("--source", default=str(BASE_DIR / "patient_data" / "patient_reports.json"))
+    parser.add_argument("--dest", default=str(BASE_DIR / "patient_data" / "patients.sqlite3"))
+    parser.add_argument("--append", action="store_true", help="Add to existing rows instead of replacing them")
+    args = parser.parse_args()
+
+    if not is_sqlite_path(args.dest):
+        raise SystemExit("--dest must end in .sqlite3, .sqlite or .db")
+    store = SQLitePatientStore(args.dest)
+    imported = import_json(args.source, store, replace=not args.append)
+    print(f"Imported {imported} reports into {args.dest} ({store.count()} total)")
+    print(f"Serve it with PATIENT_REPORTS_PATH={args.dest}")
+
+
+if __name__ == "__main__":
+    main()
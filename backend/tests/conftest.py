@@ -0,0 +1,22 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Settings are read from the environment when `app.config` is first imported, so
+# point every data path at a scratch directory before any test imports `app`
+_scratch = tempfile.mkdtemp(prefix="backend_tests_")
+for key, name in {
+    "PATIENT_REPORTS_PATH": "patient_reports.json",
+    "PDF_CHUNKS_PATH": "chunks.jsonl",
+    "AGENT_AUDIT_LOG_PATH": "logs/agent_audit.json",
+    "ERROR_LOG_PATH": "logs/error.log",
+    "WEB_SEARCH_CACHE_PATH": "web_search.sqlite3",
+    "SESSION_DB_PATH": "sessions.sqlite3",
+    "RAG_INDEX_MANIFEST_PATH": "index_manifest.json",
+}.items():
+    os.environ[key] = os.path.join(_scratch, name)
+os.environ["RAG_WARMUP_ON_STARTUP"] = "false"
+os.environ["WEB_SEARCH_PROVIDER"] = "fixture"
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,37 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main, patient_utils
+from app.config import settings
+from app.patient_store import JSONPatientStore
+from app.schemas import PatientReport
+
+
+def report(name: str) -> PatientReport:
+    return PatientReport(
+        patient_name=name,
+        discharge_date="2024-05-01",
+        diagnosis="Chronic Kidney Disease Stage 3",
+        medications=["Lisinopril 10mg daily"],
+        dietary_restrictions=["Low potassium"],
+        follow_up_instructions=["Nephrology clinic in 2 weeks"],
+        warning_signs=["Swelling"],
+        discharge_instructions=["Monitor blood pressure"],
+    )
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    store = JSONPatientStore(str(tmp_path / "patient_reports.json"))
+    store.replace_all([report(f"Maria Gomez {i}") for i in range(12)])
+    monkeypatch.setattr(patient_utils, "_store", store)
+    monkeypatch.setattr(settings, "patient_reports_path", store.path)
+    monkeypatch.setattr(settings, "patient_seed_demo_data", False)
+    return TestClient(main.app)
+
+
+def test_lookup_limit_defaults_to_setting(client, monkeypatch):
+    monkeypatch.setattr(settings, "patient_lookup_limit", 3)
+    assert len(client.get("/patients/lookup", params={"name": "maria"}).json()["matches"]) == 3
+    assert len(client.get("/patients/lookup", params={"name": "mariq gomez"}).json()["matches"]) == 3
+    assert len(client.get("/patients/lookup", params={"name": "maria", "limit": 5}).json()["matches"]) == 5
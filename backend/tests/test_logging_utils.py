@@ -0,0 +1,94 @@
+import json
+import os
+import threading
+import time
+
+from app import logging_utils
+from app.logging_utils import BatchedLogWriter, iter_log_lines, segment_index
+
+
+def read_records(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_close_keeps_records_submitted_concurrently(tmp_path):
+    path = str(tmp_path / "logs" / "audit.json")
+    writer = BatchedLogWriter(max_queue=10000, batch_size=16, flush_interval=0.01)
+    start = threading.Barrier(5)
+
+    def produce(worker):
+        start.wait()
+        for i in range(200):
+            writer.submit(path, {"timestamp": "2024-05-01T00:00:00Z", "worker": worker, "i": i})
+
+    threads = [threading.Thread(target=produce, args=(w,)) for w in range(4)]
+    for t in threads:
+        t.start()
+    start.wait()
+    writer.close()
+    for t in threads:
+        t.join()
+
+    records = read_records(path)
+    assert len(records) == 800
+    assert writer.stats["written"] == 800 and writer.stats["errors"] == 0
+
+
+def test_submit_after_close_writes_synchronously(tmp_path):
+    path = str(tmp_path / "error.log")
+    writer = BatchedLogWriter(max_queue=10, batch_size=4, flush_interval=0.01)
+    writer.submit(path, {"timestamp": "2024-05-01T00:00:00Z", "n": 1})
+    writer.close()
+    writer.submit(path, {"timestamp": "2024-05-01T00:00:01Z", "n": 2})
+    assert [r["n"] for r in read_records(path)] == [1, 2]
+    assert not writer._files
+
+
+def write_lines(path, timestamps):
+    with open(path, "a", encoding="utf-8") as f:
+        for ts in timestamps:
+            f.write(json.dumps({"timestamp": ts}) + "\n")
+
+
+def test_range_read_returns_records_stamped_out_of_order(tmp_path):
+    path = str(tmp_path / "audit.json")
+    # The 00:00:01 record was queued after a later-stamped one
+    write_lines(path, ["2024-05-01T00:00:00.000000Z", "2024-05-01T00:00:02.000000Z", "2024-05-01T00:00:01.000000Z"])
+    lines = list(iter_log_lines(path, since="2024-05-01T00:00:00.500000Z", until="2024-05-01T00:00:01.500000Z"))
+    assert [json.loads(line)["timestamp"] for line in lines] == ["2024-05-01T00:00:01.000000Z"]
+
+
+def test_active_index_is_extended_not_rebuilt(tmp_path, monkeypatch):
+    path = str(tmp_path / "audit.json")
+    write_lines(path, [f"2024-05-01T00:00:{i:02d}.000000Z" for i in range(3)])
+    assert segment_index(path, active_path=path)["count"] == 3
+
+    scanned_from = []
+    original = logging_utils.build_segment_index
+
+    def spy(segment, stride, idx=None):
+        scanned_from.append(idx["bytes"] if idx else 0)
+        return original(segment, stride, idx)
+
+    monkeypatch.setattr(logging_utils, "build_segment_index", spy)
+    assert segment_index(path, active_path=path)["count"] == 3
+    assert scanned_from == []
+    size = os.path.getsize(path)
+    write_lines(path, ["2024-05-01T00:00:03.000000Z"])
+    idx = segment_index(path, active_path=path)
+    assert scanned_from == [size]
+    assert idx["count"] == 4 and idx["last_ts"] == "2024-05-01T00:00:03.000000Z"
+
+
+def test_full_queue_blocks_only_briefly(tmp_path):
+    path = str(tmp_path / "error.log")
+    writer = BatchedLogWriter(max_queue=1, batch_size=1, flush_interval=0.01)
+    writer._thread = threading.Thread()  # never started: nothing drains the queue
+    assert writer.submit(path, {"n": 1}, block_timeout=0.01)
+    started = time.perf_counter()
+    assert not writer.submit(path, {"n": 2}, block_timeout=0.05)
+    assert time.perf_counter() - started < 1.0
+    assert writer.stats["blocked"] == 1 and writer.stats["dropped"] == 1
+    assert not writer.submit(path, {"n": 3})
+    assert writer.stats["dropped"] == 2
@@ -0,0 +1,39 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import metrics
+from app.config import settings
+from app.metrics import RequestMetricsMiddleware, current_request_id, http_latency
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(RequestMetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    def item(item_id: int):
+        return {"request_id": current_request_id()}
+
+    metrics.reset_metrics()
+    yield TestClient(app)
+    metrics.reset_metrics()
+
+
+@pytest.mark.parametrize("enabled", [True, False])
+def test_request_id_assigned_regardless_of_metrics(client, monkeypatch, enabled):
+    monkeypatch.setattr(settings, "metrics_enabled", enabled)
+    resp = client.get("/items/1", headers={"X-Request-ID": "abc123"})
+    assert resp.json()["request_id"] == "abc123"
+    assert resp.headers["x-request-id"] == "abc123"
+    assert client.get("/items/2").headers["x-request-id"]
+    recorded = http_latency.snapshot()
+    if enabled:
+        assert [(s["route"], s["count"]) for s in recorded] == [("/items/{item_id}", 2)]
+    else:
+        assert recorded == []
+
+
+def test_sub_millisecond_buckets():
+    assert http_latency.buckets[:4] == [0.00005, 0.0001, 0.00025, 0.0005]
@@ -0,0 +1,69 @@
+import random
+
+from app.patient_store import NameIndex, name_trigrams, normalize_name
+
+
+NAMES = ["Jon Smith", "John Smith", "Jon Smith", "Joan Smyth", "Maria Gomez", "Mario Gomes", "Jon  SMITH", "Li Wei"]
+
+
+def brute_force(names, query, limit, min_score):
+    # Jaccard over trigram sets; ties keep each name's first appearance, then record order
+    q = name_trigrams(normalize_name(query))
+    first = {}
+    scored = []
+    for pos, name in enumerate(names):
+        norm = normalize_name(name)
+        first.setdefault(norm, pos)
+        tg = name_trigrams(norm)
+        score = len(q & tg) / len(q | tg)
+        if score >= min_score and q & tg:
+            scored.append((-score, first[norm], pos))
+    return [(pos, -neg) for neg, _, pos in sorted(scored)[:limit]]
+
+
+def test_fuzzy_ranks_exact_name_first_and_groups_duplicates():
+    hits = NameIndex(NAMES).search_fuzzy("jon smith", limit=10, min_score=0.3)
+    # All three spellings of "jon smith" normalize to the same name and tie at 1.0
+    assert [pos for pos, _ in hits[:3]] == [0, 2, 6]
+    assert all(score == 1.0 for _, score in hits[:3])
+    assert [pos for pos, _ in hits[3:]] == [1, 3]
+    assert hits[3][1] > hits[4][1]
+
+
+def test_fuzzy_ties_between_names_keep_first_appearance():
+    # "ann bell" and "ann belt" both share 7 of 10 trigrams with the query
+    hits = NameIndex(["Ann Bell", "Ann Belt", "Ann Bell"]).search_fuzzy("ann bel", limit=10, min_score=0.0)
+    assert [pos for pos, _ in hits] == [0, 2, 1]
+    assert {score for _, score in hits} == {0.7}
+    # A limit that cuts through the tie keeps the earlier name's records
+    assert [pos for pos, _ in NameIndex(["Ann Belt", "Ann Bell", "Ann Bell"]).search_fuzzy("ann bel", limit=2)] == [0, 1]
+
+
+def test_fuzzy_cut_through_many_ties_is_deterministic():
+    # More tied names than `limit`: the earliest records are kept, not whichever
+    # side of the partition they landed on
+    names = [f"Ann Bel{chr(ord('a') + i)}" for i in range(21)]
+    index = NameIndex(names)
+    assert len({score for _, score in index.search_fuzzy("ann bel", limit=len(names), min_score=0)}) == 1
+    assert [pos for pos, _ in index.search_fuzzy("ann bel", limit=5, min_score=0)] == [0, 1, 2, 3, 4]
+
+
+def test_fuzzy_limit_and_min_score():
+    index = NameIndex(NAMES)
+    assert len(index.search_fuzzy("jon smith", limit=2)) == 2
+    assert index.search_fuzzy("jon smith", limit=0) == []
+    assert index.search_fuzzy("", limit=5) == []
+    assert all(score >= 0.6 for _, score in index.search_fuzzy("maria gomez", limit=10, min_score=0.6))
+
+
+def test_fuzzy_matches_brute_force():
+    rng = random.Random(0)
+    first = ["Jon", "John", "Joan", "Maria", "Mario", "Li", "Ana", "Anna"]
+    last = ["Smith", "Smyth", "Gomez", "Gomes", "Wei", "Wu", "Lee"]
+    names = [f"{rng.choice(first)} {rng.choice(last)}" for _ in range(200)]
+    index = NameIndex(names)
+    for query in ["jon smith", "ana lee", "mario gomez", "li wu", "xyz"]:
+        for limit in (1, 5, 40):
+            got = [(pos, round(score, 9)) for pos, score in index.search_fuzzy(query, limit=limit, min_score=0.2)]
+            want = [(pos, round(score, 9)) for pos, score in brute_force(names, query, limit, 0.2)]
+            assert got == want, (query, limit)
@@ -0,0 +1,60 @@
+import pytest
+
+from app import patient_utils
+from app.config import settings
+from app.patient_store import JSONPatientStore, SQLitePatientStore
+from app.schemas import PatientReport
+
+
+def report(name: str, discharge_date: str = "2024-05-01") -> PatientReport:
+    return PatientReport(
+        patient_name=name,
+        discharge_date=discharge_date,
+        diagnosis="Acute Kidney Injury",
+        medications=["Diuretic"],
+        dietary_restrictions=["Low sodium"],
+        follow_up_instructions=["Check BMP in 1 week"],
+        warning_signs=["Chest pain"],
+        discharge_instructions=["Avoid NSAIDs"],
+    )
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def store(request, tmp_path, monkeypatch):
+    if request.param == "sqlite":
+        s = SQLitePatientStore(str(tmp_path / "patients.sqlite3"))
+    else:
+        s = JSONPatientStore(str(tmp_path / "patient_reports.json"))
+    monkeypatch.setattr(patient_utils, "_store", s)
+    monkeypatch.setattr(settings, "patient_reports_path", s.path)
+    return s
+
+
+def test_lookup_never_replaces_existing_records(store, monkeypatch):
+    # Fewer records than MIN_PATIENT_RECORDS used to trigger a destructive reseed
+    monkeypatch.setattr(settings, "patient_seed_demo_data", True)
+    patient_utils.add_patient_reports([report("Ada Real"), report("Ben Real"), report("Cy Real")])
+
+    assert [r.patient_name for r in patient_utils.lookup_patient_by_name("ada")] == ["Ada Real"]
+    assert patient_utils.search_patients_by_name("Ben Reel")
+    assert patient_utils.patient_count() == 3
+    assert sorted(r.patient_name for r in patient_utils.load_patient_reports()) == ["Ada Real", "Ben Real", "Cy Real"]
+
+
+def test_empty_store_is_seeded_only_when_enabled(store, monkeypatch):
+    monkeypatch.setattr(settings, "patient_seed_demo_data", False)
+    assert patient_utils.lookup_patient_by_name("alex") == []
+    assert patient_utils.patient_count() == 0
+
+    monkeypatch.setattr(settings, "patient_seed_demo_data", True)
+    assert patient_utils.patient_count() >= settings.min_patient_records
+    seeded = patient_utils.patient_count()
+    patient_utils.lookup_patient_by_name("alex")
+    assert patient_utils.patient_count() == seeded
+
+
+def test_seed_dummy_patients_replaces_explicitly(store):
+    patient_utils.add_patient_reports([report("Ada Real")])
+    patient_utils.seed_dummy_patients(5)
+    assert patient_utils.patient_count() == 5
+    assert patient_utils.lookup_patient_by_name("ada real") == []
@@ -0,0 +1,98 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.patient_store import JSONPatientStore, SQLitePatientStore
+from app.schemas import PatientReport
+
+
+NAMES = ["Ada Lovelace", "Alan Turing", "Ada Lovelace", "Grace Hopper", "Alan Kay", "Edsger Dijkstra"]
+QUERIES = ["ada", "alan", "lovelace", "ace hop", "Ada Lovelase", "Alan Turin", "Grace Hoper", "nobody"]
+
+
+def report(name: str, discharge_date: str = "2024-05-01") -> PatientReport:
+    return PatientReport(
+        patient_name=name,
+        discharge_date=discharge_date,
+        diagnosis="Chronic Kidney Disease Stage 3",
+        medications=["Lisinopril 10mg daily"],
+        dietary_restrictions=["Low potassium"],
+        follow_up_instructions=["Nephrology clinic in 2 weeks"],
+        warning_signs=["Swelling"],
+        discharge_instructions=["Monitor blood pressure"],
+    )
+
+
+def initial():
+    return [report(n, f"2024-05-{i + 1:02d}") for i, n in enumerate(NAMES)]
+
+
+@pytest.fixture
+def stores(tmp_path):
+    json_store = JSONPatientStore(str(tmp_path / "patient_reports.json"))
+    sqlite_store = SQLitePatientStore(str(tmp_path / "patients.sqlite3"))
+    for s in (json_store, sqlite_store):
+        s.replace_all(initial())
+    return json_store, sqlite_store
+
+
+def names(reports):
+    return [r.patient_name for r in reports]
+
+
+def assert_parity(json_store, sqlite_store):
+    assert json_store.count() == sqlite_store.count()
+    assert names(json_store.reports()) == names(sqlite_store.reports())
+    for q in QUERIES:
+        assert names(json_store.find_substring(q)) == names(sqlite_store.find_substring(q)), q
+        fuzzy_json = [(r.patient_name, round(s, 6)) for r, s in json_store.search_fuzzy(q, limit=4)]
+        fuzzy_sqlite = [(r.patient_name, round(s, 6)) for r, s in sqlite_store.search_fuzzy(q, limit=4)]
+        assert fuzzy_json == fuzzy_sqlite, q
+    for kwargs in ({"name": "ada lovelace"}, {"discharged_from": "2024-05-03", "discharged_to": "2024-05-05"}):
+        assert names(r for _, r in json_store.find_records(**kwargs)) == names(r for _, r in sqlite_store.find_records(**kwargs))
+
+
+def test_stores_agree(stores):
+    assert_parity(*stores)
+
+
+def test_stores_agree_after_appends_and_updates(stores):
+    json_store, sqlite_store = stores
+    for s in stores:
+        s.append([report("Ada Byron"), report("Alan Turing", "2024-06-01")])
+        s.count()
+    # Rename an original record and one just appended, addressed by each store's own ids
+    for s in stores:
+        (first_id, _), _ = s.find_records(name="Ada Lovelace")
+        s.update(first_id, report("Grace Brewster Hopper"))
+        (byron_id, _), = s.find_records(name="Ada Byron")
+        s.update(byron_id, report("Ada King"))
+    assert_parity(json_store, sqlite_store)
+
+
+def test_sqlite_patches_own_writes_and_reloads_foreign_ones(tmp_path):
+    path = str(tmp_path / "patients.sqlite3")
+    store = SQLitePatientStore(path)
+    store.replace_all(initial())
+    base = store._load().index
+
+    store.append([report("Barbara Liskov")])
+    (record_id, _), = store.find_records(name="Alan Kay")
+    store.update(record_id, report("Alan Curtis Kay"))
+    assert store._load().index is base
+    assert names(store.find_substring("liskov")) == ["Barbara Liskov"]
+    assert names(store.find_substring("alan")) == ["Alan Turing", "Alan Curtis Kay"]
+    assert store.count() == len(NAMES) + 1
+
+    SQLitePatientStore(path).append([report("John Backus")])
+    assert names(store.find_substring("backus")) == ["John Backus"]
+    assert store._load().index is not base
+    assert store.count() == len(NAMES) + 2
+
+
+def test_json_concurrent_appends_are_not_lost(tmp_path):
+    store = JSONPatientStore(str(tmp_path / "patient_reports.json"))
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: store.append([report(f"Patient {i}")]), range(16)))
+    assert store.count() == 16
+    assert not [p for p in tmp_path.iterdir() if p.suffix == ".tmp"]
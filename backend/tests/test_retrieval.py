@@ -0,0 +1,147 @@
+import asyncio
+import time
+
+import pytest
+
+from app import agent_orchestration, rag_retriever
+from app.bm25 import reciprocal_rank_fusion
+from app.config import settings
+from app.query_batcher import QueryBatcher
+from app.retriever_base import BaseRetriever
+
+
+def hit(cid, distance=None, bm25=None):
+    return {"id": cid, "text": cid, "metadata": {}, "distance": distance, "bm25": bm25}
+
+
+def test_rrf_orders_by_fused_rank():
+    dense = [hit("a", 0.1), hit("b", 0.2), hit("c", 0.3)]
+    lexical = [hit("c", bm25=9.0), hit("d", bm25=5.0), hit("a", bm25=1.0)]
+    fused = reciprocal_rank_fusion([dense, lexical], k=4, rrf_k=60)
+    # a: 1/61 + 1/63, c: 1/63 + 1/61 tie; first-seen order is kept for ties
+    assert [r["id"] for r in fused] == ["a", "c", "b", "d"]
+    # Dense copy wins so distances survive; lexical scores are merged in
+    assert fused[1]["distance"] == 0.3 and fused[1]["bm25"] == 9.0
+    assert fused[3]["distance"] is None
+
+
+def test_rrf_truncates_to_k():
+    ranking = [hit(str(i), 0.1 * i) for i in range(10)]
+    assert len(reciprocal_rank_fusion([ranking], k=3)) == 3
+
+
+@pytest.fixture
+def max_distance(monkeypatch):
+    monkeypatch.setattr(settings, "rag_max_distance", 0.5)
+
+
+def test_retrieval_gate_uses_best_dense_distance(max_distance):
+    # Fused list topped by a lexical-only hit: the dense hit below it decides
+    assert agent_orchestration._retrieval_is_good([hit("x", bm25=4.0), hit("y", 0.4)])
+    assert not agent_orchestration._retrieval_is_good([hit("x", bm25=4.0), hit("y", 0.9)])
+
+
+def test_lexical_only_results_fail_distance_gate(max_distance):
+    assert not agent_orchestration._retrieval_is_good([hit("x", bm25=4.0), hit("y", bm25=2.0)])
+
+
+def test_retrieval_gate_disabled(monkeypatch):
+    monkeypatch.setattr(settings, "rag_max_distance", None)
+    assert agent_orchestration._retrieval_is_good([hit("x", bm25=4.0)])
+    assert not agent_orchestration._retrieval_is_good([])
+
+
+class FakeRetriever(BaseRetriever):
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+        super().__init__()
+
+    def _embed(self, texts):
+        time.sleep(self.delay)
+        self.batches.append(list(texts))
+        return [len(t) for t in texts]
+
+    def _search(self, embeddings, k):
+        return [[hit(f"len-{e}", 0.1)] for e in embeddings]
+
+    def _index_version(self):
+        return 0
+
+
+@pytest.fixture
+def batching(monkeypatch):
+    monkeypatch.setattr(settings, "rag_hybrid_enabled", False)
+    monkeypatch.setattr(settings, "rag_batching_enabled", True)
+    monkeypatch.setattr(settings, "rag_batch_max_wait_ms", 20)
+
+
+def test_aretrieve_coalesces_concurrent_queries(batching):
+    retriever = FakeRetriever()
+
+    async def run():
+        return await asyncio.gather(*(retriever.aretrieve(q, top_k=1) for q in ["a", "bb", "ccc"]))
+
+    results = asyncio.run(run())
+    assert [r[0]["id"] for r in results] == ["len-1", "len-2", "len-3"]
+    assert retriever.batches == [["a", "bb", "ccc"]]
+
+
+def test_aretrieve_times_out(batching, monkeypatch):
+    monkeypatch.setattr(settings, "rag_batch_timeout_ms", 50)
+    retriever = FakeRetriever(delay=0.5)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(retriever.aretrieve("slow", top_k=1))
+
+
+def test_embeds_original_text_under_normalized_cache_key(monkeypatch):
+    monkeypatch.setattr(settings, "rag_hybrid_enabled", False)
+    monkeypatch.setattr(settings, "rag_batching_enabled", False)
+    retriever = FakeRetriever()
+    retriever.embed_queries(["ACE  inhibitor dose", "ace inhibitor dose"])
+    retriever.embed_query("Ace Inhibitor Dose")
+    assert retriever.batches == [["ACE  inhibitor dose"]]
+
+
+def test_aretrieve_cache_hit_skips_batch_window(batching, monkeypatch):
+    monkeypatch.setattr(settings, "rag_batch_max_wait_ms", 200)
+    retriever = FakeRetriever()
+
+    async def run():
+        first = await retriever.aretrieve("potassium diet", top_k=1)
+        started = time.perf_counter()
+        again = await retriever.aretrieve("Potassium  diet", top_k=1)
+        return first, again, time.perf_counter() - started
+
+    first, again, elapsed = asyncio.run(run())
+    assert again == first
+    assert elapsed < 0.05
+    assert retriever.batches == [["potassium diet"]]
+
+
+def test_ready_only_after_an_embedding_succeeds(monkeypatch):
+    monkeypatch.setattr(settings, "rag_hybrid_enabled", False)
+    monkeypatch.setattr(settings, "rag_batching_enabled", False)
+    monkeypatch.setattr(rag_retriever, "_retriever", None)
+    monkeypatch.setattr(rag_retriever, "_warmup_error", "model download failed")
+    rag_retriever.set_retriever(FakeRetriever())
+    status = rag_retriever.retriever_status()
+    assert status["loaded"] and not status["ready"] and status["error"]
+
+    rag_retriever.warm_up()
+    status = rag_retriever.retriever_status()
+    assert status["ready"] and status["error"] is None
+
+
+def test_batcher_runs_each_top_k_separately():
+    calls = []
+
+    def handler(queries, k):
+        calls.append((sorted(queries), k))
+        return [[hit(f"{q}-{i}") for i in range(k)] for q in queries]
+
+    batcher = QueryBatcher(handler, max_batch=8, max_wait=0.05)
+    futures = [batcher.submit("a", 1), batcher.submit("b", 3), batcher.submit("c", 1)]
+    results = [f.result(timeout=5) for f in futures]
+    assert sorted(calls, key=lambda c: c[1]) == [(["a", "c"], 1), (["b"], 3)]
+    assert [len(r) for r in results] == [1, 3, 1]
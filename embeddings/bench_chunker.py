@@ -0,0 +1,177 @@
+import argparse
+import json
+import random
+import time
+from typing import Any, Dict, List
+
+from extract_pdf_chunks import _split_into_sentences, chunk_pages, guess_section_header, words_count
+
+
+# Previous chunk_pages, kept verbatim as the reference for output equivalence:
+# it re-joins the sentence buffer to count words and rebuilds the overlap with
+# list.insert(0, ...), both quadratic in the buffer size.
+def legacy_chunk_pages(
+    pages: List[Dict[str, Any]],
+    file_label: str,
+    min_words: int = 300,
+    max_words: int = 500,
+    overlap_words: int = 60,
+) -> List[Dict[str, Any]]:
+    chunks: List[Dict[str, Any]] = []
+    current_section: str | None = None
+    buffer_sentences: List[str] = []
+    buffer_page: int | None = None
+    chunk_idx = 0
+
+    def buffer_word_len() -> int:
+        return words_count(" ".join(buffer_sentences))
+
+    for page in pages:
+        page_num = page["page"]
+        lines = page["text"].splitlines()
+
+        # Detect potential section headers, but sentence-split per page
+        page_text = []
+        for line in lines:
+            header = guess_section_header(line)
+            if header:
+                current_section = header
+            page_text.append(line)
+        sentences = _split_into_sentences(" ".join(page_text))
+
+        for sent in sentences:
+            candidate_words = words_count(sent)
+            if buffer_page is None:
+                buffer_page = page_num
+            # If adding this sentence exceeds max, emit a chunk if >= min
+            if buffer_word_len() + candidate_words > max_words and buffer_word_len() >= min_words:
+                chunk_text = " ".join(buffer_sentences)
+                chunks.append(
+                    {
+                        "id": f"{file_label}-p{buffer_page}-c{chunk_idx}",
+                        "file": file_label,
+                        "page": buffer_page,
+                        "section": current_section,
+                        "text": chunk_text,
+                    }
+                )
+                chunk_idx += 1
+                # Apply overlap by words (approximate by sentences)
+                if overlap_words > 0:
+                    # keep tail sentences until overlap satisfied
+                    retained: List[str] = []
+                    running = 0
+                    for s in reversed(buffer_sentences):
+                        w = words_count(s)
+                        if running >= overlap_words:
+                            break
+                        retained.insert(0, s)
+                        running += w
+                    buffer_sentences = retained
+                else:
+                    buffer_sentences = []
+                buffer_page = page_num
+
+            buffer_sentences.append(sent)
+
+        # At page end, if buffer is within limits, emit a chunk
+        if min_words <= buffer_word_len() <= max_words:
+            chunk_text = " ".join(buffer_sentences)
+            chunks.append(
+                {
+                    "id": f"{file_label}-p{buffer_page}-c{chunk_idx}",
+                    "file": file_label,
+                    "page": buffer_page,
+                    "section": current_section,
+                    "text": chunk_text,
+                }
+            )
+            chunk_idx += 1
+            buffer_sentences = []
+            buffer_page = None
+
+    # Flush remainder
+    if buffer_sentences:
+        chunk_text = " ".join(buffer_sentences)
+        chunks.append(
+            {
+                "id": f"{file_label}-tail-c{chunk_idx}",
+                "file": file_label,
+                "page": buffer_page,
+                "section": current_section,
+                "text": chunk_text,
+            }
+        )
+
+    chunks = [c for c in chunks if words_count(c["text"]) >= max(50, min_words // 2)]
+    return chunks
+
+
+WORDS = (
+    "kidney renal dialysis sodium potassium phosphate fluid creatinine nephron glomerular "
+    "filtration patient dose urine protein albumin blood pressure transplant anemia edema"
+).split()
+HEADERS = ["CHRONIC KIDNEY DISEASE", "ACUTE KIDNEY INJURY", "Treatment:", "Diagnosis:", "DIALYSIS"]
+
+
+def synthetic_pages(num_pages: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    pages = []
+    for pno in range(1, num_pages + 1):
+        lines = []
+        if rng.random() < 0.15:
+            lines.append(rng.choice(HEADERS))
+        for _ in range(rng.randint(15, 45)):
+            words = [rng.choice(WORDS) for _ in range(rng.randint(4, 30))]
+            lines.append(" ".join(words).capitalize() + rng.choice([".", ".", "?", "!"]))
+        pages.append({"page": pno, "text": "\n".join(lines)})
+    return pages
+
+
+def time_chunker(fn: Any, pages: List[Dict[str, Any]], repeat: int, **kwargs: Any) -> tuple:
+    best = float("inf")
+    out: List[Dict[str, Any]] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn(pages, file_label="bench", **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark chunk_pages against the previous quadratic chunker")
+    parser.add_argument("--pages", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--windows",
+        default="300:500:60,1000:2000:200,3000:5000:600",
+        help="Comma-separated min:max:overlap word windows",
+    )
+    args = parser.parse_args()
+
+    pages = synthetic_pages(args.pages, args.seed)
+    results = []
+    for window in args.windows.split(","):
+        min_words, max_words, overlap_words = (int(x) for x in window.split(":"))
+        kwargs = {"min_words": min_words, "max_words": max_words, "overlap_words": overlap_words}
+        legacy_s, legacy = time_chunker(legacy_chunk_pages, pages, args.repeat, **kwargs)
+        new_s, new = time_chunker(chunk_pages, pages, args.repeat, **kwargs)
+        if new != legacy:
+            raise SystemExit(f"Output mismatch for window {window}")
+        results.append(
+            {
+                "window": window,
+                "pages": args.pages,
+                "chunks": len(new),
+                "legacy_s": round(legacy_s, 4),
+                "new_s": round(new_s, 4),
+                "speedup": round(legacy_s / new_s, 1) if new_s else None,
+                "identical": True,
+            }
+        )
+        print(json.dumps(results[-1]))
+
+
+if __name__ == "__main__":
+    main()
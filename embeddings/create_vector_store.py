@@ -1,20 +1,24 @@
 import argparse
 import json
 import os
+import sys
 from pathlib import Path
-from typing import List, Dict, Any
 
 import numpy as np
 import chromadb
 from chromadb.utils import embedding_functions
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+from app.chunk_io import iter_chunks  # noqa: E402
+from app.index_sync import EmbedChunks, chunk_id, max_batch_size, sync_collection  # noqa: E402
+
 
 def main() -> None:
-    parser = argparse.ArgumentParser(description="Create Chroma vector store from chunks and optional cached embeddings")
+    parser = argparse.ArgumentParser(description="Create or incrementally sync the Chroma vector store from chunks and optional cached embeddings")
     parser.add_argument(
         "--chunks",
         default=str(Path(__file__).resolve().parent / "chunks.json"),
-        help="Path to chunks.json",
+        help="Path to chunks.json or chunks.jsonl",
     )
     parser.add_argument(
         "--persist_dir",
@@ -32,37 +36,68 @@ def main() -> None:
         default=str(Path(__file__).resolve().parent / "embeddings.npy"),
         help="Optional precomputed embeddings .npy (if exists will be used)",
     )
+    parser.add_argument("--batch_size", type=int, default=1000, help="Items per Chroma upsert call")
     parser.add_argument(
         "--ids",
         default=str(Path(__file__).resolve().parent / "ids.json"),
         help="Optional ids.json for precomputed embeddings",
     )
+    parser.add_argument(
+        "--checkpoint_every",
+        type=int,
+        default=10,
+        help="Batches between manifest checkpoints; a rerun after interruption resumes from the last one",
+    )
+    parser.add_argument(
+        "--manifest",
+        default=None,
+        help="Index manifest (chunk id -> content hash); defaults to index_manifest.json next to --ids",
+    )
     args = parser.parse_args()
 
-    with open(args.chunks, "r", encoding="utf-8") as f:
-        chunks: List[Dict[str, Any]] = json.load(f)
-    texts = [c.get("text", "") for c in chunks]
-    metadatas = [{k: v for k, v in c.items() if k != "text"} for c in chunks]
-    ids = [c.get("id", str(i)) for i, c in enumerate(chunks)]
+    # Chunks are streamed twice (ids first, then the sync) instead of held in memory
+    ids = [chunk_id(c, i) for i, c in enumerate(iter_chunks(args.chunks))]
 
     client = chromadb.PersistentClient(path=args.persist_dir)
+    embed_fn = embedding_functions.SentenceTransformerEmbeddingFunction(model_name=args.model)
+    collection = client.get_or_create_collection(name=args.collection, embedding_function=embed_fn)
 
-    # If we have cached embeddings, use them
-    use_cached = os.path.exists(args.embeddings) and os.path.exists(args.ids)
-    if use_cached:
+    # Embedded here rather than inside upsert so the next batch is encoded while
+    # the current one is written; cached embeddings are used when they match
+    def embed_texts(batch_ids, batch):
+        return embed_fn([c.get("text", "") for c in batch])
+
+    embed: EmbedChunks = embed_texts
+    source = "on-the-fly"
+    if os.path.exists(args.embeddings) and os.path.exists(args.ids):
         cached_ids = json.load(open(args.ids, "r", encoding="utf-8"))
-        if len(cached_ids) == len(ids) and cached_ids == ids:
-            embeddings = np.load(args.embeddings)
-            collection = client.get_or_create_collection(name=args.collection)
-            collection.add(ids=ids, documents=texts, metadatas=metadatas, embeddings=embeddings.tolist())
-            print(f"Added {len(ids)} items to collection '{args.collection}' with cached embeddings.")
-            return
+        if cached_ids == ids:
+            # Memory-mapped; only rows of changed chunks are read
+            embeddings = np.load(args.embeddings, mmap_mode="r")
+            row_of = {cid: i for i, cid in enumerate(ids)}
 
-    # Fallback to on-the-fly embedding function
-    embed_fn = embedding_functions.SentenceTransformerEmbeddingFunction(model_name=args.model)
-    collection = client.get_or_create_collection(name=args.collection, embedding_function=embed_fn)
-    collection.add(ids=ids, documents=texts, metadatas=metadatas)
-    print(f"Added {len(ids)} items to collection '{args.collection}' with on-the-fly embeddings.")
+            def embed_cached(batch_ids, batch):
+                return np.asarray(embeddings[[row_of[cid] for cid in batch_ids]], dtype=np.float32)
+
+            embed = embed_cached
+            source = "cached"
+
+    stats = sync_collection(
+        collection,
+        iter_chunks(args.chunks),
+        args.manifest or str(Path(args.ids).parent / "index_manifest.json"),
+        model=args.model,
+        store=os.path.abspath(args.persist_dir),
+        embed=embed,
+        batch_size=max_batch_size(client, args.batch_size),
+        checkpoint_every=args.checkpoint_every,
+        progress=lambda p: print(f"Upserted {p['upserted']} chunks ({p['chunks_per_s']:.1f} chunks/s)"),
+    )
+    print(
+        f"Synced collection '{args.collection}' with {source} embeddings: "
+        f"{stats['added']} added, {stats['updated']} updated, {stats['removed']} removed, {stats['unchanged']} unchanged "
+        f"in {stats['elapsed_s']:.1f}s ({stats['chunks_per_s']} chunks/s)."
+    )
 
 
 if __name__ == "__main__":
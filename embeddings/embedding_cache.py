@@ -0,0 +1,79 @@
+import hashlib
+import os
+import sqlite3
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    # Persistent float32 embeddings keyed by (model, sha256(text)), so re-chunking
+    # only pays for text that has not been embedded before by the same model.
+    def __init__(self, path: str, model: str) -> None:
+        self.path = path
+        self.model = model
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, key TEXT NOT NULL, dim INTEGER NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, key))"
+        )
+        self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys: Sequence[str], chunk_size: int = 500) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        unique = list(dict.fromkeys(keys))
+        for start in range(0, len(unique), chunk_size):
+            part = unique[start : start + chunk_size]
+            marks = ",".join("?" * len(part))
+            rows = self.conn.execute(
+                f"SELECT key, dim, vector FROM embeddings WHERE model = ? AND key IN ({marks})",
+                [self.model, *part],
+            )
+            for key, dim, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32, count=dim)
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]) -> None:
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, key, dim, vector) VALUES (?, ?, ?, ?)",
+                [
+                    (self.model, key, int(vec.shape[0]), np.asarray(vec, dtype=np.float32).tobytes())
+                    for key, vec in items.items()
+                ],
+            )
+
+    def encode(self, texts: List[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        # Returns one row per text; only distinct texts missing from the cache reach encode_fn
+        keys = [text_key(t) for t in texts]
+        found = self.get_many(keys)
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        self.hits += sum(1 for key in keys if key in found)
+        self.misses += len(keys) - sum(1 for key in keys if key in found)
+        if missing:
+            fresh = np.asarray(encode_fn(list(missing.values())), dtype=np.float32)
+            new = dict(zip(missing.keys(), fresh))
+            self.put_many(new)
+            found.update(new)
+        if not keys:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.stack([found[key] for key in keys]).astype(np.float32, copy=False)
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+    def close(self) -> None:
+        self.conn.close()
@@ -0,0 +1,227 @@
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+from app.chunk_io import iter_chunks  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.rag_retriever import build_retriever  # noqa: E402
+
+
+# Labeled query file (JSON array or JSONL), one object per query:
+#   {"query": "...", "chunk_ids": ["nephrology-p14-c10"], "pages": [14]}
+# With --match id a retrieved chunk is relevant when its id is listed; with
+# --match page when its page is, which keeps labels valid across re-chunking.
+
+
+def load_queries(path: str) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        if path.lower().endswith(".jsonl"):
+            return [json.loads(line) for line in f if line.strip()]
+        return json.load(f)
+
+
+def write_queries(path: str, queries: List[Dict[str, Any]]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        if path.lower().endswith(".jsonl"):
+            f.writelines(json.dumps(q, ensure_ascii=False) + "\n" for q in queries)
+        else:
+            json.dump(queries, f, ensure_ascii=False, indent=2)
+
+
+def synthesize_queries(chunks_path: str, n: int, words: int, seed: int = 0) -> List[Dict[str, Any]]:
+    # Known-item queries: a contiguous word span from a sampled chunk, labeled with
+    # that chunk's id and page. Spans share exact wording with their source, so
+    # they favour lexical matching; prefer hand-written questions where available.
+    rng = random.Random(seed)
+    # (position in the file, chunk): the position is the id fallback for chunks without one
+    sample: List[Tuple[int, Dict[str, Any]]] = []
+    for i, ch in enumerate(iter_chunks(chunks_path)):
+        # Reservoir sampling keeps memory bounded for large JSONL files
+        if len(sample) < n:
+            sample.append((i, ch))
+        elif (j := rng.randint(0, i)) < n:
+            sample[j] = (i, ch)
+    queries = []
+    for i, ch in sample:
+        tokens = ch.get("text", "").split()
+        if len(tokens) < words:
+            continue
+        start = rng.randint(0, len(tokens) - words)
+        queries.append(
+            {
+                "query": " ".join(tokens[start : start + words]),
+                "chunk_ids": [str(ch.get("id", i))],
+                "pages": [ch["page"]] if ch.get("page") is not None else [],
+            }
+        )
+    return queries
+
+
+def coerce(name: str, raw: str) -> Any:
+    field = type(settings).model_fields.get(name)
+    if field is None:
+        raise SystemExit(f"Unknown setting '{name}'")
+    current = getattr(settings, name)
+    if raw.lower() in ("none", "null") and field.annotation is not None and "None" in str(field.annotation):
+        return None
+    if isinstance(current, bool):
+        return raw.lower() in ("1", "true", "yes")
+    if isinstance(current, int):
+        return int(raw)
+    if isinstance(current, float) or "float" in str(field.annotation):
+        return float(raw)
+    return raw
+
+
+def parse_config(spec: str) -> Tuple[str, Dict[str, Any]]:
+    # "name:setting=value,setting=value"; setting names are Settings fields (lowercase env vars)
+    name, _, body = spec.partition(":")
+    overrides: Dict[str, Any] = {}
+    for pair in filter(None, body.split(",")):
+        key, _, value = pair.partition("=")
+        overrides[key.strip().lower()] = coerce(key.strip().lower(), value.strip())
+    return name, overrides
+
+
+def load_configs(args: argparse.Namespace) -> List[Tuple[str, Dict[str, Any]]]:
+    configs = [parse_config(spec) for spec in args.config]
+    if args.configs_file:
+        with open(args.configs_file, "r", encoding="utf-8") as f:
+            for name, overrides in json.load(f).items():
+                configs.append((name, {k.lower(): coerce(k.lower(), str(v)) for k, v in overrides.items()}))
+    return configs or [("current", {})]
+
+
+def relevant(result: Dict[str, Any], labels: set, match: str) -> bool:
+    if match == "id":
+        return str(result.get("id")) in labels
+    return (result.get("metadata") or {}).get("page") in labels
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def evaluate(
+    name: str,
+    overrides: Dict[str, Any],
+    queries: List[Dict[str, Any]],
+    ks: List[int],
+    match: str,
+    repeat: int,
+) -> Dict[str, Any]:
+    # Caches would turn every repeat into a lookup, so latency is measured cold per
+    # query; micro-batching would only add its wait window to sequential queries.
+    # Either can still be set explicitly in a configuration.
+    defaults = {"rag_cache_size": 0, "rag_batching_enabled": False}
+    applied = {**defaults, **overrides}
+    saved = {key: getattr(settings, key) for key in applied}
+    try:
+        for key, value in applied.items():
+            setattr(settings, key, value)
+        started = time.perf_counter()
+        retriever = build_retriever()
+        retriever.warm_up()
+        # One untimed query pays for lazy index/BM25 loads so they don't land on the first sample
+        retriever.retrieve(queries[0]["query"], top_k=max(ks))
+        setup_s = time.perf_counter() - started
+
+        max_k = max(ks)
+        recall = {k: 0.0 for k in ks}
+        hits = {k: 0 for k in ks}
+        mrr = 0.0
+        latencies: List[float] = []
+        details = []
+        for item in queries:
+            labels = set(str(x) for x in item.get("chunk_ids", [])) if match == "id" else set(item.get("pages", []))
+            timings = []
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                results = retriever.retrieve(item["query"], top_k=max_k)
+                timings.append((time.perf_counter() - t0) * 1000.0)
+            latency = min(timings)
+            latencies.append(latency)
+            flags = [relevant(r, labels, match) for r in results[:max_k]]
+            first = next((rank for rank, ok in enumerate(flags, 1) if ok), None)
+            mrr += 1.0 / first if first else 0.0
+            for k in ks:
+                top = results[:k]
+                found = {str(r.get("id")) if match == "id" else (r.get("metadata") or {}).get("page") for r in top}
+                recall[k] += len(labels & found) / len(labels)
+                hits[k] += 1 if any(flags[:k]) else 0
+            details.append({"query": item["query"], "first_relevant_rank": first, "latency_ms": round(latency, 3)})
+    finally:
+        for key, value in saved.items():
+            setattr(settings, key, value)
+
+    n = len(queries)
+    ordered = sorted(latencies)
+    summary: Dict[str, Any] = {"config": name, "overrides": overrides, "queries": n, "setup_s": round(setup_s, 2)}
+    for k in ks:
+        summary[f"recall@{k}"] = round(recall[k] / n, 4) if n else 0.0
+        summary[f"hit@{k}"] = round(hits[k] / n, 4) if n else 0.0
+    summary["mrr"] = round(mrr / n, 4) if n else 0.0
+    summary["latency_mean_ms"] = round(sum(ordered) / n, 3) if n else 0.0
+    summary["latency_p50_ms"] = round(percentile(ordered, 0.50), 3)
+    summary["latency_p95_ms"] = round(percentile(ordered, 0.95), 3)
+    summary["latency_p99_ms"] = round(percentile(ordered, 0.99), 3)
+    return {"summary": summary, "details": details}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Recall@k / MRR / latency of retrieval configurations over a labeled query set")
+    parser.add_argument("--queries", default=None, help="Labeled queries (JSON or JSONL)")
+    parser.add_argument("--synthesize", type=int, default=0, help="Build N known-item queries from PDF_CHUNKS_PATH instead")
+    parser.add_argument("--synth_words", type=int, default=12, help="Words per synthesized query")
+    parser.add_argument("--write_queries", default=None, help="Save the (synthesized) query set here for reuse")
+    parser.add_argument(
+        "--config",
+        action="append",
+        default=[],
+        help="name:setting=value,... e.g. int8:rag_backend=numpy,numpy_index_dtype=int8 (repeatable)",
+    )
+    parser.add_argument("--configs_file", default=None, help='JSON {"name": {"SETTING": value, ...}, ...}')
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 4, 5, 10])
+    parser.add_argument("--match", choices=["id", "page"], default="id")
+    parser.add_argument("--repeat", type=int, default=1, help="Timed runs per query; the fastest is reported")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="Write summaries (and per-query details) as JSON")
+    args = parser.parse_args()
+
+    if args.queries:
+        queries = load_queries(args.queries)
+    elif args.synthesize:
+        queries = synthesize_queries(settings.pdf_chunks_path, args.synthesize, args.synth_words, args.seed)
+    else:
+        raise SystemExit("Pass --queries or --synthesize N")
+    label_key = "chunk_ids" if args.match == "id" else "pages"
+    labeled = [q for q in queries if q.get(label_key)]
+    if len(labeled) < len(queries):
+        print(f"Skipping {len(queries) - len(labeled)} queries without {label_key}")
+    if not labeled:
+        raise SystemExit("No labeled queries to evaluate")
+    if args.write_queries:
+        write_queries(args.write_queries, labeled)
+
+    reports = []
+    for name, overrides in load_configs(args):
+        report = evaluate(name, overrides, labeled, sorted(set(args.k)), args.match, max(1, args.repeat))
+        reports.append(report)
+        print(json.dumps(report["summary"]))
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"match": args.match, "k": args.k, "reports": reports}, f, indent=2)
+        print(f"Saved report to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
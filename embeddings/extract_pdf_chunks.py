@@ -1,12 +1,17 @@
 import argparse
-import json
 import os
+import sys
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Deque, Iterator, Tuple
 import re
 
 import fitz  # PyMuPDF
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+from app.chunk_io import is_jsonl, write_chunks  # noqa: E402
+
 
 def guess_section_header(line: str) -> str | None:
     text = line.strip()
@@ -19,13 +24,90 @@ def guess_section_header(line: str) -> str | None:
     return None
 
 
-def extract_pdf_text_with_meta(pdf_path: str) -> List[Dict[str, Any]]:
-    doc = fitz.open(pdf_path)
-    pages: List[Dict[str, Any]] = []
-    for pno, page in enumerate(doc, start=1):
-        text = page.get_text()
-        pages.append({"page": pno, "text": text})
-    return pages
+def extract_page_range(task: Tuple[str, int, int]) -> List[Dict[str, Any]]:
+    # Runs in a worker process: fitz documents can't be pickled, so each task
+    # opens the file itself and extracts pages [start, end) (0-based)
+    pdf_path, start, end = task
+    with fitz.open(pdf_path) as doc:
+        return [{"page": pno + 1, "text": doc[pno].get_text()} for pno in range(start, end)]
+
+
+def find_pdfs(inputs: List[str]) -> List[Path]:
+    # Files are taken as given, directories are searched recursively; sorted so
+    # chunk order and ids don't depend on filesystem listing order
+    found: List[Path] = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            found.extend(sorted(p for p in path.rglob("*") if p.is_file() and p.suffix.lower() == ".pdf"))
+        else:
+            found.append(path)
+    return list(dict.fromkeys(found))
+
+
+def file_labels(pdfs: List[Path]) -> List[str]:
+    # The stem, as for a single PDF; files sharing a stem get their parent folders
+    # prepended until the labels are unique
+    labels = [p.stem for p in pdfs]
+    depth = 1
+    while len(set(labels)) < len(labels):
+        labels = [
+            "-".join(list(p.with_suffix("").parts[-(depth + 1) :])) if labels.count(label) > 1 else label
+            for p, label in zip(pdfs, labels)
+        ]
+        depth += 1
+        if depth > max(len(p.parts) for p in pdfs):
+            raise ValueError("Could not derive unique labels for input PDFs")
+    return labels
+
+
+def _chunk_file(args: Tuple[List[Dict[str, Any]], str, int, int, int]) -> List[Dict[str, Any]]:
+    pages, file_label, min_words, max_words, overlap_words = args
+    return chunk_pages(pages, file_label=file_label, min_words=min_words, max_words=max_words, overlap_words=overlap_words)
+
+
+def _page_tasks(pdf: Path, pages_per_task: int) -> List[Tuple[str, int, int]]:
+    with fitz.open(str(pdf)) as doc:
+        page_count = doc.page_count
+    return [(str(pdf), start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
+
+
+def extract_corpus(
+    pdfs: List[Path],
+    labels: List[str],
+    min_words: int,
+    max_words: int,
+    overlap_words: int,
+    workers: int | None = None,
+    pages_per_task: int = 32,
+) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+    # Pages are extracted in parallel in fixed-size ranges, then each file is
+    # chunked in order (section headers carry across pages). Only a window of
+    # files is in flight at once and results are yielded per file in input
+    # order, so output is identical to a sequential run and memory stays bounded.
+    lookahead = max(2, 2 * (workers or os.cpu_count() or 1))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        page_jobs: Deque[Tuple[str, List[Future]]] = deque()
+        chunk_jobs: Deque[Tuple[str, Future]] = deque()
+
+        def chunk_oldest_file() -> None:
+            label, futures = page_jobs.popleft()
+            pages = [p for f in futures for p in f.result()]
+            job = (pages, label, min_words, max_words, overlap_words)
+            chunk_jobs.append((label, pool.submit(_chunk_file, job)))
+
+        for pdf, label in zip(pdfs, labels):
+            page_jobs.append((label, [pool.submit(extract_page_range, t) for t in _page_tasks(pdf, pages_per_task)]))
+            if len(page_jobs) >= lookahead:
+                chunk_oldest_file()
+            while chunk_jobs and (len(chunk_jobs) >= lookahead or chunk_jobs[0][1].done()):
+                done_label, fut = chunk_jobs.popleft()
+                yield done_label, fut.result()
+        while page_jobs:
+            chunk_oldest_file()
+        while chunk_jobs:
+            done_label, fut = chunk_jobs.popleft()
+            yield done_label, fut.result()
 
 
 def words_count(s: str) -> int:
@@ -48,12 +130,24 @@ def chunk_pages(
 ) -> List[Dict[str, Any]]:
     chunks: List[Dict[str, Any]] = []
     current_section: str | None = None
-    buffer_sentences: List[str] = []
+    # (sentence, word count) pairs plus a running total, so the buffer length is
+    # never recomputed by re-joining and re-splitting the sentences
+    buffer: Deque[Tuple[str, int]] = deque()
+    buffer_words = 0
     buffer_page: int | None = None
     chunk_idx = 0
 
-    def buffer_word_len() -> int:
-        return words_count(" ".join(buffer_sentences))
+    def emit(chunk_id: str) -> None:
+        chunks.append(
+            {
+                "id": chunk_id,
+                "file": file_label,
+                "page": buffer_page,
+                "section": current_section,
+                "text": " ".join(s for s, _ in buffer),
+                "_words": buffer_words,
+            }
+        )
 
     for page in pages:
         page_num = page["page"]
@@ -73,101 +167,87 @@ def chunk_pages(
             if buffer_page is None:
                 buffer_page = page_num
             # If adding this sentence exceeds max, emit a chunk if >= min
-            if buffer_word_len() + candidate_words > max_words and buffer_word_len() >= min_words:
-                chunk_text = " ".join(buffer_sentences)
-                chunks.append(
-                    {
-                        "id": f"{file_label}-p{buffer_page}-c{chunk_idx}",
-                        "file": file_label,
-                        "page": buffer_page,
-                        "section": current_section,
-                        "text": chunk_text,
-                    }
-                )
+            if buffer_words + candidate_words > max_words and buffer_words >= min_words:
+                emit(f"{file_label}-p{buffer_page}-c{chunk_idx}")
                 chunk_idx += 1
-                # Apply overlap by words (approximate by sentences)
+                # Apply overlap by words (approximate by sentences): keep the
+                # shortest tail reaching overlap_words, dropping from the left
+                keep = 0
+                running = 0
                 if overlap_words > 0:
-                    # keep tail sentences until overlap satisfied
-                    retained: List[str] = []
-                    running = 0
-                    for s in reversed(buffer_sentences):
-                        w = words_count(s)
+                    for _, w in reversed(buffer):
                         if running >= overlap_words:
                             break
-                        retained.insert(0, s)
+                        keep += 1
                         running += w
-                    buffer_sentences = retained
-                else:
-                    buffer_sentences = []
+                while len(buffer) > keep:
+                    buffer.popleft()
+                buffer_words = running
                 buffer_page = page_num
 
-            buffer_sentences.append(sent)
+            buffer.append((sent, candidate_words))
+            buffer_words += candidate_words
 
         # At page end, if buffer is within limits, emit a chunk
-        if min_words <= buffer_word_len() <= max_words:
-            chunk_text = " ".join(buffer_sentences)
-            chunks.append(
-                {
-                    "id": f"{file_label}-p{buffer_page}-c{chunk_idx}",
-                    "file": file_label,
-                    "page": buffer_page,
-                    "section": current_section,
-                    "text": chunk_text,
-                }
-            )
+        if min_words <= buffer_words <= max_words:
+            emit(f"{file_label}-p{buffer_page}-c{chunk_idx}")
             chunk_idx += 1
-            buffer_sentences = []
+            buffer.clear()
+            buffer_words = 0
             buffer_page = None
 
     # Flush remainder
-    if buffer_sentences:
-        chunk_text = " ".join(buffer_sentences)
-        chunks.append(
-            {
-                "id": f"{file_label}-tail-c{chunk_idx}",
-                "file": file_label,
-                "page": buffer_page,
-                "section": current_section,
-                "text": chunk_text,
-            }
-        )
+    if buffer:
+        emit(f"{file_label}-tail-c{chunk_idx}")
 
-    chunks = [c for c in chunks if words_count(c["text"]) >= max(50, min_words // 2)]
-    return chunks
+    min_chunk_words = max(50, min_words // 2)
+    kept = [c for c in chunks if c["_words"] >= min_chunk_words]
+    for c in kept:
+        del c["_words"]
+    return kept
 
 
 def main() -> None:
-    parser = argparse.ArgumentParser(description="Extract PDF into chunked JSON for RAG")
-    parser.add_argument("pdf", help="Path to nephrology reference PDF")
+    parser = argparse.ArgumentParser(description="Extract PDFs into chunked JSON for RAG")
+    parser.add_argument("pdf", nargs="+", help="Reference PDF(s) or directories to search for *.pdf")
     parser.add_argument(
         "--out",
         default=str(Path(__file__).resolve().parent / "chunks.json"),
-        help="Output chunks.json path",
+        help="Output path; a .jsonl suffix writes one chunk per line",
     )
+    parser.add_argument("--shards_dir", default=None, help="Also write one chunk file per PDF here")
     parser.add_argument("--min_words", type=int, default=300)
     parser.add_argument("--max_words", type=int, default=500)
     parser.add_argument("--overlap_words", type=int, default=60)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--pages_per_task", type=int, default=32)
     args = parser.parse_args()
 
-    pdf_path = args.pdf
-    file_label = Path(pdf_path).stem
-    pages = extract_pdf_text_with_meta(pdf_path)
-    chunks = chunk_pages(
-        pages,
-        file_label=file_label,
+    pdfs = find_pdfs(args.pdf)
+    if not pdfs:
+        parser.error("no PDF files found")
+    labels = file_labels(pdfs)
+    per_file = extract_corpus(
+        pdfs,
+        labels,
         min_words=args.min_words,
         max_words=args.max_words,
         overlap_words=args.overlap_words,
+        workers=args.workers,
+        pages_per_task=args.pages_per_task,
     )
 
-    os.makedirs(Path(args.out).parent, exist_ok=True)
-    with open(args.out, "w", encoding="utf-8") as f:
-        json.dump(chunks, f, ensure_ascii=False)
-    print(f"Wrote {len(chunks)} chunks to {args.out}")
+    shard_suffix = ".jsonl" if is_jsonl(args.out) else ".json"
 
+    def stream_chunks() -> Iterator[Dict[str, Any]]:
+        for label, file_chunks in per_file:
+            if args.shards_dir:
+                write_chunks(str(Path(args.shards_dir) / f"{label}{shard_suffix}"), file_chunks)
+            yield from file_chunks
 
-if __name__ == "__main__":
-    main()
+    count = write_chunks(args.out, stream_chunks())
+    print(f"Wrote {count} chunks from {len(pdfs)} PDF(s) to {args.out}")
 
 
- 
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,26 @@
 import argparse
 import json
 import os
+import sys
 from pathlib import Path
 from typing import List
 
 import numpy as np
 from sentence_transformers import SentenceTransformer
 
+from embedding_cache import EmbeddingCache
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+from app.chunk_io import count_chunks, iter_batches, iter_chunks  # noqa: E402
+from app.quantization import QUANTIZED_DTYPES, save_quantized  # noqa: E402
+
 
 def main() -> None:
-    parser = argparse.ArgumentParser(description="Generate embeddings for chunks.json")
+    parser = argparse.ArgumentParser(description="Generate embeddings for chunks.json / chunks.jsonl")
     parser.add_argument(
         "--chunks",
         default=str(Path(__file__).resolve().parent / "chunks.json"),
-        help="Path to chunks.json",
+        help="Path to chunks.json or chunks.jsonl",
     )
     parser.add_argument(
         "--model",
@@ -26,22 +33,76 @@ def main() -> None:
         help="Output directory for embeddings and ids",
     )
     parser.add_argument("--batch_size", type=int, default=32)
+    parser.add_argument("--stream_batch", type=int, default=4096, help="Chunks read and embedded per step")
+    parser.add_argument(
+        "--cache",
+        default=str(Path(__file__).resolve().parent / "embedding_cache.sqlite3"),
+        help="Embedding cache keyed by sha256(text) + model",
+    )
+    parser.add_argument("--no_cache", action="store_true", help="Re-encode every chunk")
+    parser.add_argument(
+        "--dtype",
+        choices=QUANTIZED_DTYPES,
+        action="append",
+        default=[],
+        help="Also write a quantized copy (repeatable); see quantize_embeddings.py for recall",
+    )
     args = parser.parse_args()
 
-    with open(args.chunks, "r", encoding="utf-8") as f:
-        chunks = json.load(f)
-    texts: List[str] = [c.get("text", "") for c in chunks]
-    ids: List[str] = [c.get("id", str(i)) for i, c in enumerate(chunks)]
+    model: SentenceTransformer | None = None
 
-    model = SentenceTransformer(args.model)
-    embeddings = model.encode(texts, batch_size=args.batch_size, convert_to_numpy=True, show_progress_bar=True)
+    def encode(batch: List[str]) -> np.ndarray:
+        # The model is only loaded if something actually needs encoding
+        nonlocal model
+        if model is None:
+            model = SentenceTransformer(args.model)
+        return model.encode(batch, batch_size=args.batch_size, convert_to_numpy=True, show_progress_bar=True)
 
+    cache = None if args.no_cache else EmbeddingCache(args.cache, args.model)
     out_dir = Path(args.out_dir)
     os.makedirs(out_dir, exist_ok=True)
-    np.save(out_dir / "embeddings.npy", embeddings)
-    with open(out_dir / "ids.json", "w", encoding="utf-8") as f:
+    emb_path = out_dir / "embeddings.npy"
+    ids_path = out_dir / "ids.json"
+
+    # Chunks are read and embedded in --stream_batch slices and written straight
+    # into a memory-mapped .npy, so neither the corpus nor the matrix is held in RAM
+    total = count_chunks(args.chunks)
+    embeddings: np.ndarray | None = None
+    ids: List[str] = []
+    row = 0
+    for batch in iter_batches(iter_chunks(args.chunks), args.stream_batch):
+        texts = [c.get("text", "") for c in batch]
+        ids.extend(c.get("id", str(row + i)) for i, c in enumerate(batch))
+        vectors = cache.encode(texts, encode) if cache is not None else encode(texts)
+        if embeddings is None:
+            embeddings = np.lib.format.open_memmap(
+                f"{emb_path}.tmp", mode="w+", dtype=np.float32, shape=(total, vectors.shape[1])
+            )
+        embeddings[row : row + len(batch)] = vectors
+        row += len(batch)
+        print(f"Embedded {row}/{total} chunks")
+    if cache is not None:
+        cache.close()
+        stats = cache.stats()
+        print(f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.1%} hit rate)")
+
+    if embeddings is None:
+        with open(f"{emb_path}.tmp", "wb") as f:
+            np.save(f, np.zeros((0, 0), dtype=np.float32))
+    else:
+        embeddings.flush()
+        del embeddings
+    # ids.json is swapped in first: a running NumpyRetriever reloads when
+    # embeddings.npy changes, so by then the matching ids are already in place
+    with open(f"{ids_path}.tmp", "w", encoding="utf-8") as f:
         json.dump(ids, f)
-    print(f"Saved embeddings to {out_dir / 'embeddings.npy'} and ids to {out_dir / 'ids.json'}")
+    os.replace(f"{ids_path}.tmp", ids_path)
+    os.replace(f"{emb_path}.tmp", emb_path)
+    print(f"Saved embeddings to {emb_path} and ids to {ids_path}")
+    embeddings = np.load(emb_path, mmap_mode="r")
+    for dtype in args.dtype:
+        path, nbytes = save_quantized(str(out_dir), embeddings, dtype)
+        print(f"Saved {dtype} embeddings to {path} ({nbytes} bytes)")
 
 
 if __name__ == "__main__":
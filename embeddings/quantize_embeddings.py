@@ -0,0 +1,83 @@
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+from app.quantization import QUANTIZED_DTYPES, cosine_scores, load_quantized, row_norms, save_quantized, top_k  # noqa: E402
+
+
+def recall_report(
+    index_dir: Path,
+    dtype: str,
+    num_queries: int,
+    k: int,
+    rerank_candidates: int,
+    seed: int = 0,
+) -> Dict[str, float]:
+    # Uses perturbed stored vectors as queries and compares top-k ids against an
+    # exact float32 search over the same matrix.
+    full = np.load(index_dir / "embeddings.npy", mmap_mode="r")
+    quant, _ = load_quantized(str(index_dir), dtype)
+    n, dim = full.shape
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(n, size=min(num_queries, n), replace=False)
+    queries = np.asarray(full[picks], dtype=np.float32)
+    queries += rng.normal(scale=0.05 * float(np.abs(queries).mean() or 1.0), size=queries.shape).astype(np.float32)
+    queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+    exact = cosine_scores(full, row_norms(full), queries)
+    approx = cosine_scores(quant, row_norms(quant), queries)
+    hits = 0
+    hits_reranked = 0
+    for col in range(queries.shape[0]):
+        truth = set(top_k(exact[:, col], k).tolist())
+        hits += len(truth & set(top_k(approx[:, col], k).tolist()))
+        cand = np.sort(top_k(approx[:, col], max(k, rerank_candidates)))
+        rows = np.asarray(full[cand], dtype=np.float32)
+        rescored = (rows @ queries[col]) / np.maximum(np.linalg.norm(rows, axis=1), 1e-12)
+        hits_reranked += len(truth & set(cand[top_k(rescored, k)].tolist()))
+    total = queries.shape[0] * min(k, n)
+    return {
+        "dtype": dtype,
+        "rows": n,
+        "dim": dim,
+        "queries": int(queries.shape[0]),
+        "k": k,
+        f"recall@{k}": hits / total,
+        f"recall@{k}_reranked": hits_reranked / total,
+        "rerank_candidates": rerank_candidates,
+        "float32_bytes": int(full.nbytes),
+        "quantized_bytes": int(quant.nbytes),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Write float16/int8 copies of embeddings.npy and report recall vs float32")
+    parser.add_argument(
+        "--index_dir",
+        default=str(Path(__file__).resolve().parent),
+        help="Directory containing embeddings.npy",
+    )
+    parser.add_argument("--dtype", choices=list(QUANTIZED_DTYPES) + ["all"], default="all")
+    parser.add_argument("--queries", type=int, default=200, help="Sampled queries for the recall report")
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--rerank_candidates", type=int, default=50)
+    parser.add_argument("--no_report", action="store_true", help="Only write the quantized files")
+    args = parser.parse_args()
+
+    index_dir = Path(args.index_dir)
+    full = np.load(index_dir / "embeddings.npy", mmap_mode="r")
+    dtypes: List[str] = list(QUANTIZED_DTYPES) if args.dtype == "all" else [args.dtype]
+    for dtype in dtypes:
+        path, nbytes = save_quantized(str(index_dir), full, dtype)
+        print(f"Saved {dtype} embeddings to {path} ({nbytes / full.nbytes:.0%} of float32)")
+        if not args.no_report:
+            print(json.dumps(recall_report(index_dir, dtype, args.queries, args.k, args.rerank_candidates)))
+
+
+if __name__ == "__main__":
+    main()
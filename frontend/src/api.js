@@ -20,6 +20,43 @@ export async function chatSession(payload) {
   return data
 }
 
+// Streams /chat/stream (Server-Sent Events over a POST body) and calls
+// onEvent(event, data) for each message; resolves with the final "done" payload.
+export async function streamChatSession(payload, onEvent) {
+  const res = await fetch(`${api.defaults.baseURL}/chat/stream`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json', Accept: 'text/event-stream' },
+    body: JSON.stringify(payload),
+  })
+  if (!res.ok || !res.body) throw new Error(`chat stream failed: ${res.status}`)
+  const reader = res.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  let final = null
+  for (;;) {
+    const { value, done } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+    let sep
+    while ((sep = buffer.indexOf('\n\n')) !== -1) {
+      const raw = buffer.slice(0, sep)
+      buffer = buffer.slice(sep + 2)
+      let event = 'message'
+      let data = ''
+      for (const line of raw.split('\n')) {
+        if (line.startsWith('event: ')) event = line.slice(7)
+        else if (line.startsWith('data: ')) data += line.slice(6)
+      }
+      const parsed = data ? JSON.parse(data) : null
+      if (event === 'error') throw new Error(parsed?.detail || 'chat stream error')
+      if (event === 'done') final = parsed
+      onEvent?.(event, parsed)
+    }
+  }
+  if (!final) throw new Error('chat stream ended early')
+  return final
+}
+
 export async function ragQuery(payload) {
   const { data } = await api.post('/rag/query', payload)
   return data
@@ -1,5 +1,5 @@
 import { useEffect, useRef, useState } from 'react'
-import { chatSession, fetchAgentLogs } from '../api'
+import { chatSession, fetchAgentLogs, streamChatSession } from '../api'
 import { estimateConfidence, formatCitationLabel } from '../utils/helpers'
 import CitationModal from './CitationModal'
 import ConfidenceMeter from './ConfidenceMeter'
@@ -17,16 +17,44 @@ export default function ChatTimeline({ patient, onReset }) {
 
   useEffect(() => { endRef.current?.scrollIntoView({ behavior: 'smooth' }) }, [messages])
 
-  async function sendMessage(text) {
-    if (!text) return
-    setLoading(true)
-    setMessages((m) => [...m, { role: 'user', content: text }])
+  async function exchange(text) {
+    const payload = { session_id: sessionId, message: text, patient_name: patient?.patient_name }
+    let streamed = false
     try {
-      const res = await chatSession({ session_id: sessionId, message: text, patient_name: patient?.patient_name })
+      const res = await streamChatSession(payload, (event, data) => {
+        streamed = true
+        if (event === 'session') setSessionId(data.session_id)
+        else if (event === 'receptionist') setMessages((m) => [...m, { role: 'assistant', agent: 'receptionist', content: data.message }])
+        else if (event === 'handoff') setHandoff(`${data.from}->${data.to}`)
+        else if (event === 'citations') {
+          setLastCitations(data.citations || [])
+          setMessages((m) => [...m, { role: 'assistant', agent: 'clinical', content: '', citations: data.citations }])
+        } else if (event === 'answer') {
+          // Append the delta to the clinical bubble opened by the citations event
+          setMessages((m) => {
+            const last = m[m.length - 1]
+            return [...m.slice(0, -1), { ...last, content: last.content + data.delta }]
+          })
+        }
+      })
+      setHandoff(res.handoff || '')
+    } catch (e) {
+      if (streamed) throw e
+      // Streaming unavailable (older backend, buffering proxy): fall back to a single request
+      const res = await chatSession(payload)
       setSessionId(res.session_id)
       setMessages((m) => [...m, { role: 'assistant', agent: res.agent, content: res.response, citations: res.citations }])
       setLastCitations(res.citations || [])
       setHandoff(res.handoff || '')
+    }
+  }
+
+  async function sendMessage(text) {
+    if (!text) return
+    setLoading(true)
+    setMessages((m) => [...m, { role: 'user', content: text }])
+    try {
+      await exchange(text)
     } catch (e) {
       setMessages((m) => [...m, { role: 'assistant', agent: 'system', content: 'Error contacting server.' }])
     } finally {
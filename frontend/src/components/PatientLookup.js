@@ -45,9 +45,9 @@ export default function PatientLookup({ onResolved }) {
       {result && (
         <div style={{ marginTop: 16 }}>
           {result.status === 'not_found' && <div>No patient found.</div>}
-          {result.status === 'multiple' && (
+          {(result.status === 'multiple' || result.status === 'fuzzy') && (
             <div>
-              <div>Multiple matches found. Please refine:</div>
+              <div>{result.status === 'fuzzy' ? 'No exact match. Did you mean:' : 'Multiple matches found. Please refine:'}</div>
               <ul>
                 {result.matches.map((m, idx) => (
                   <li key={idx}><button onClick={() => onResolved(m)}>{m.patient_name}</button></li>